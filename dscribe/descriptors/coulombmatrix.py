@@ -15,10 +15,12 @@ limitations under the License.
 """
 import numpy as np
 
+from scipy.sparse import coo_matrix
+
 from ase import Atoms
 
 from dscribe.core import System
-from dscribe.descriptors.matrixdescriptor import MatrixDescriptor
+from dscribe.descriptors.matrixdescriptor import MatrixDescriptor, DIAGONAL_VALUES
 
 
 class CoulombMatrix(MatrixDescriptor):
@@ -86,6 +88,96 @@ class CoulombMatrix(MatrixDescriptor):
 
         return output
 
+    def create_batch(self, systems, batch_size=256):
+        """Creates the flattened Coulomb matrices for multiple systems in
+        batches. The zero padded matrices of each batch are stacked into a
+        three-dimensional array, which allows the charge scaling and the
+        sorting to be done with array operations for the whole batch. Each
+        batch is then written directly into its rows of the final output.
+
+        Only the "none" and "sorted_l2" permutations are supported.
+
+        Args:
+            systems (list of :class:`ase.Atoms`): The atomic structures.
+            batch_size (int): The number of systems that are processed at
+                once. Controls the size of the temporary arrays.
+
+        Returns:
+            np.ndarray | scipy.sparse.csr_matrix: The flattened Coulomb
+            matrices with one row per system.
+        """
+        if self.permutation not in ("none", "sorted_l2"):
+            raise ValueError(
+                "Batched creation is only supported for the 'none' and "
+                "'sorted_l2' permutations."
+            )
+        if batch_size <= 0:
+            raise ValueError(
+                "The batch size must be a positive number."
+            )
+        n_samples = len(systems)
+        n_max = self.n_atoms_max
+
+        # The output has the same precision as create() with multiple systems
+        dtype = np.float32 if self.dtype is None else self.dtype
+        output = np.empty((n_samples, n_max*n_max), dtype=dtype)
+        for start in range(0, n_samples, batch_size):
+            batch = systems[start:start+batch_size]
+            output[start:start+len(batch)] = self._get_batch_matrices(batch).reshape(len(batch), n_max*n_max)
+
+        # If a sparse matrix is requested, convert to csr_matrix
+        if self._sparse:
+            output = coo_matrix(output).tocsr()
+
+        return output
+
+    def _get_batch_matrices(self, systems):
+        """Creates the zero padded and permuted Coulomb matrices for a batch
+        of systems.
+
+        Args:
+            systems (list of :class:`ase.Atoms`): The atomic structures.
+
+        Returns:
+            np.ndarray: The matrices as an array of shape (n_systems,
+            n_atoms_max, n_atoms_max).
+        """
+        n_samples = len(systems)
+        n_max = self.n_atoms_max
+
+        # Gather the zero padded charges and inverse distances. The padded
+        # atoms have zero charge, so their rows and columns stay zero.
+        z = np.zeros((n_samples, n_max), dtype=int)
+        cmat = np.zeros((n_samples, n_max, n_max), dtype=self._get_matrix_dtype())
+        for i_sample, system in enumerate(systems):
+            system = self.get_system(system)
+            system.set_pbc(False)
+            n_atoms = len(system)
+            if n_atoms > n_max:
+                raise ValueError(
+                    "The system has {} atoms, which is more than the given "
+                    "n_atoms_max={}.".format(n_atoms, n_max)
+                )
+            z[i_sample, :n_atoms] = system.get_atomic_numbers()
+            cmat[i_sample, :n_atoms, :n_atoms] = system.get_inverse_distance_matrix()
+
+        # Multiply by charges and set the diagonal
+        q = z.astype(self._get_matrix_dtype())
+        cmat *= q[:, None, :]
+        cmat *= q[:, :, None]
+        diag = np.arange(n_max)
+        cmat[:, diag, diag] = DIAGONAL_VALUES[z]
+
+        # Sort the rows and columns of each matrix by the descending norms of
+        # the rows. The padded rows have zero norm and remain at the end.
+        if self.permutation == "sorted_l2":
+            norms_squared = np.einsum("bij,bij->bi", cmat, cmat)
+            sorted_indices = np.argsort(-norms_squared, axis=-1)
+            cmat = np.take_along_axis(cmat, sorted_indices[:, :, None], axis=1)
+            cmat = np.take_along_axis(cmat, sorted_indices[:, None, :], axis=2)
+
+        return cmat
+
     def get_matrix(self, system):
         """Creates the Coulomb matrix for the given system.
 
@@ -98,14 +190,21 @@ class CoulombMatrix(MatrixDescriptor):
         # Make sure that the system is non-periodic
         system.set_pbc(False)
 
-        # Calculate offdiagonals
-        q = system.get_atomic_numbers()
-        qiqj = q[None, :]*q[:, None]
+        # Calculate offdiagonals. The matrix is built directly in the output
+        # precision.
+        z = system.get_atomic_numbers()
+        q = z.astype(self._get_matrix_dtype())
         idmat = system.get_inverse_distance_matrix()
         np.fill_diagonal(idmat, 0)
-        cmat = qiqj*idmat
+        idmat = idmat.astype(self._get_matrix_dtype(), copy=False)
+
+        # Multiply by charges. The first product creates a new matrix so that
+        # the cached inverse distance matrix is not modified, and the second one
+        # is done in place.
+        cmat = idmat*q[None, :]
+        cmat *= q[:, None]
 
         # Set diagonal
-        np.fill_diagonal(cmat, 0.5 * q ** 2.4)
+        np.fill_diagonal(cmat, DIAGONAL_VALUES[z])
 
         return cmat
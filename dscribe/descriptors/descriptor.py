@@ -29,16 +29,19 @@ from joblib import Parallel, delayed
 class Descriptor(ABC):
     """An abstract base class for all descriptors.
     """
+    _dtype_options = ["float16", "float32", "float64"]
 
-    def __init__(self, periodic, flatten, sparse):
+    def __init__(self, periodic, flatten, sparse, dtype="float32"):
         """
         Args:
             flatten (bool): Whether the output of create() should be flattened
                 to a 1D array.
+            dtype (str): The data type of the output of create().
         """
         self.sparse = sparse
         self.flatten = flatten
         self.periodic = periodic
+        self.dtype = dtype
         self._atomic_numbers = None
         self._atomic_number_set = None
         self._species = None
@@ -99,8 +102,44 @@ class Descriptor(ABC):
         Args:
             value(float): Should the output be in sparse format.
         """
+        self._check_sparse_dtype(value, getattr(self, "_dtype", None))
         self._sparse = value
 
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @dtype.setter
+    def dtype(self, value):
+        """Sets the data type of the output.
+
+        Args:
+            value(str): The data type of the output, e.g. "float32". Must be
+                one of the options listed in _dtype_options.
+        """
+        if value not in self._dtype_options:
+            raise ValueError(
+                "Unknown dtype given. Please use one of the following: {}."
+                .format(", ".join(str(x) for x in self._dtype_options))
+            )
+        self._check_sparse_dtype(getattr(self, "_sparse", False), value)
+        self._dtype = value
+
+    def _check_sparse_dtype(self, sparse, dtype):
+        """Used to check that the sparse output and the data type are
+        compatible.
+
+        Args:
+            sparse(bool): Whether the output is sparse.
+            dtype(str): The data type of the output.
+        """
+        if sparse and dtype == "float16":
+            raise ValueError(
+                "Cannot provide a sparse output in half precision because "
+                "the scipy sparse matrices do not support it. Please use "
+                "sparse=False or a different dtype."
+            )
+
     @property
     def periodic(self):
         return self._periodic
@@ -147,20 +186,22 @@ class Descriptor(ABC):
         this descriptor.
 
         Args:
-            species(iterable): Atomic numbers to check.
+            atomic_numbers(np.ndarray): Atomic numbers to check.
 
         Raises:
             ValueError: If the atomic numbers in the given system are not
             included in the species given to this descriptor.
         """
         # Check that the system does not have elements that are not in the list
-        # of atomic numbers
-        zs = set(atomic_numbers)
-        if not zs.issubset(self._atomic_number_set):
+        # of atomic numbers. Only the unique atomic numbers are compared
+        # against the sorted list of defined atomic numbers.
+        zs = np.unique(atomic_numbers)
+        is_defined = np.isin(zs, self._atomic_numbers, assume_unique=True)
+        if not is_defined.all():
             raise ValueError(
                 "The given system has the following atomic numbers not defined "
                 "for this descriptor: {}"
-                .format(zs.difference(self._atomic_number_set))
+                .format(set(zs[~is_defined].tolist()))
             )
 
     def create_parallel(self, inp, func, n_jobs, output_sizes=None, verbose=False, prefer="processes"):
@@ -205,6 +246,9 @@ class Descriptor(ABC):
         n_samples = len(inp)
         n_features = self.get_number_of_features()
         is_sparse = self._sparse
+        # Descriptors without a fixed output precision are stored in single
+        # precision when combined
+        dtype = np.float32 if self.dtype is None else self.dtype
         k, m = divmod(n_samples, n_jobs)
         jobs = (inp[i * k + min(i, m):(i + 1) * k + min(i + 1, m)] for i in range(n_jobs))
 
@@ -228,7 +272,7 @@ class Descriptor(ABC):
                     rows = []
                     cols = []
                 else:
-                    results = np.empty((n_desc, n_features), dtype=np.float32)
+                    results = np.empty((n_desc, n_features), dtype=dtype)
 
             offset = 0
             i_sample = 0
@@ -259,7 +303,7 @@ class Descriptor(ABC):
                 data = np.concatenate(data)
                 rows = np.concatenate(rows)
                 cols = np.concatenate(cols)
-                results = coo_matrix((data, (rows, cols)), shape=[n_desc, n_features], dtype=np.float32)
+                results = coo_matrix((data, (rows, cols)), shape=[n_desc, n_features], dtype=dtype)
 
             return (results, index)
 
@@ -298,7 +342,7 @@ class Descriptor(ABC):
                 data = np.concatenate(data)
                 rows = np.concatenate(rows)
                 cols = np.concatenate(cols)
-                results = coo_matrix((data, (rows, cols)), shape=[n_descs, n_features], dtype=np.float32)
+                results = coo_matrix((data, (rows, cols)), shape=[n_descs, n_features], dtype=dtype)
 
                 # The final output is transformed into CSR form which is faster for
                 # linear algebra
@@ -14,12 +14,39 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 import math
+from functools import lru_cache
+
 import numpy as np
 from scipy.special import erf
 from scipy.sparse import lil_matrix
 from dscribe.descriptors import Descriptor
 
 
+@lru_cache(maxsize=16)
+def _get_cdf_grid(minimum, maximum, n, std):
+    """Used to get the grid on which the cumulative distribution functions of
+    the gaussians are evaluated. The grid only depends on the settings of a
+    property, so the most recently used grids are cached and shared by all the
+    systems instead of being recreated for each of them.
+
+    Args:
+        minimum (float): The minimum grid value
+        maximum (float): The maximum grid value
+        n (int): Number of grid points
+        std (float): Standard deviation of the gaussian
+
+    Returns:
+        tuple: The read-only grid of n+1 bin edges, the grid spacing and the
+        factor 1/(std*sqrt(2)) that scales the distances in the error function.
+    """
+    dx = (maximum - minimum)/(n-1)
+    x = np.linspace(minimum-dx/2, maximum+dx/2, n+1)
+    x.flags.writeable = False
+    inv_scale = 1/(std*math.sqrt(2))
+
+    return x, dx, inv_scale
+
+
 class ElementalDistribution(Descriptor):
     """Represents a generic distribution on any given grid for any given
     properties. Can create both continuos and discrete distributions.
@@ -241,14 +268,16 @@ class ElementalDistribution(Descriptor):
         """
         max_val = 1/(std*math.sqrt(2*math.pi))
 
-        dx = (maximum - minimum)/(n-1)
-        x = np.linspace(minimum-dx/2, maximum+dx/2, n+1)
+        x, dx, inv_scale = _get_cdf_grid(minimum, maximum, n, std)
         pos = x[np.newaxis, :] - centers[:, np.newaxis]
-        y = weights[:, np.newaxis]*1/2*(1 + erf(pos/(std*np.sqrt(2))))
-        f = np.sum(y, axis=0)
-        f /= max_val
-        f_rolled = np.roll(f, -1)
-        pdf = (f_rolled - f)[0:-1]/dx  # PDF is the derivative of CDF
+        pos *= inv_scale
+
+        # The weighted sum of the CDFs is a single matrix-vector product. The
+        # constant part of the CDF cancels out in the differences between the
+        # bin edges, so only the error functions are summed.
+        f = np.dot(weights, erf(pos))
+        pdf = np.diff(f)  # PDF is the derivative of CDF
+        pdf *= 0.5/(dx*max_val)
 
         return pdf
 
@@ -17,10 +17,7 @@ import sys
 import math
 import numpy as np
 
-from sklearn.preprocessing import normalize
-
 from scipy.sparse import coo_matrix
-from scipy.sparse import lil_matrix
 import scipy.spatial.distance
 
 from ase import Atoms
@@ -119,6 +116,7 @@ class LMBTR(MBTR):
             normalization="none",
             flatten=True,
             sparse=False,
+            dtype="float32",
             ):
         """
         Args:
@@ -167,6 +165,11 @@ class LMBTR(MBTR):
                 "k3":
             sparse (bool): Whether the output should be a sparse matrix or a
                 dense numpy array.
+            dtype (str): The data type of the output. The available options
+                are "float16", "float32" and "float64". The terms are always
+                calculated in single precision and only the final output is
+                converted. Defaults to "float32". The half precision output is
+                only available for dense output.
         """
         super().__init__(
             k1=None,
@@ -178,6 +181,7 @@ class LMBTR(MBTR):
             normalize_gaussians=normalize_gaussians,
             flatten=flatten,
             sparse=sparse,
+            dtype=dtype,
         )
 
     @property
@@ -287,14 +291,13 @@ class LMBTR(MBTR):
 
         # Check that the system does not have elements that are not in the list
         # of atomic numbers
-        atomic_number_set = set(system.get_atomic_numbers())
-        self.check_atomic_numbers(atomic_number_set)
-        self._interaction_limit = len(system)
         system_positions = system.get_positions()
         system_atomic_numbers = system.get_atomic_numbers()
+        self.check_atomic_numbers(system_atomic_numbers)
+        self._interaction_limit = len(system)
 
         # Ensure that the atomic number 0 is not present in the system
-        if 0 in atomic_number_set:
+        if 0 in system_atomic_numbers:
             raise ValueError(
                 "Please do not use the atomic number 0 in local MBTR as it "
                 "is reserved to mark the atoms use as analysis centers."
@@ -380,8 +383,12 @@ class LMBTR(MBTR):
         if self.normalization == "l2_each":
             if self.flatten is True:
                 for key, value in mbtr.items():
-                    value_normalized = normalize(value, norm='l2', axis=1)
-                    mbtr[key] = value_normalized
+                    # Each row corresponds to one local center and is
+                    # normalized separately. Rows with only zeros are left
+                    # untouched.
+                    norms = np.linalg.norm(value, axis=1)
+                    norms[norms == 0] = 1
+                    value /= norms[:, None]
             else:
                 for key, value in mbtr.items():
                     for array in value:
@@ -389,30 +396,15 @@ class LMBTR(MBTR):
                         i_norm = np.linalg.norm(i_data)
                         array /= i_norm
 
-        # Flatten output if requested
+        # Flatten output if requested. The terms are stored as dense arrays
+        # and only the final concatenated output is turned into a sparse
+        # matrix if requested.
         if self.flatten:
-            length = 0
-
-            datas = []
-            rows = []
-            cols = []
-            for key in sorted(mbtr.keys()):
-                tensor = mbtr[key]
-                size = tensor.shape[1]
-                coo = tensor.tocoo()
-                datas.append(coo.data)
-                rows.append(coo.row)
-                cols.append(coo.col + length)
-                length += size
-
-            datas = np.concatenate(datas)
-            rows = np.concatenate(rows)
-            cols = np.concatenate(cols)
-            result = coo_matrix((datas, (rows, cols)), shape=[n_loc, length], dtype=np.float32)
-
-            # Make into a dense array if requested
-            if not self.sparse:
-                result = result.toarray()
+            result = np.concatenate([mbtr[key] for key in sorted(mbtr.keys())], axis=1)
+            result = result.astype(self.dtype, copy=False)
+
+            if self.sparse:
+                result = coo_matrix(result)
         # Otherwise return a list of dictionaries, each dictionary containing
         # the requested unflattened tensors
         else:
@@ -421,7 +413,7 @@ class LMBTR(MBTR):
                 i_dict = {}
                 for key in mbtr.keys():
                     tensor = mbtr[key]
-                    i_dict[key] = tensor[i_loc]
+                    i_dict[key] = tensor[i_loc].astype(self.dtype, copy=False)
                 result[i_loc] = i_dict
 
         return result
@@ -459,10 +451,10 @@ class LMBTR(MBTR):
             n_features += n_k2
         if self.k3 is not None:
             n_k3_grid = self.k3["grid"]["n"]
-            n_k3 = n_elem*(3*n_elem-1)*n_k3_grid/2  # = (n_elem*n_elem + (n_elem-1)*n_elem/2)*n_k3_grid
+            n_k3 = n_elem*(3*n_elem-1)*n_k3_grid//2  # = (n_elem*n_elem + (n_elem-1)*n_elem/2)*n_k3_grid
             n_features += n_k3
 
-        return int(n_features)
+        return n_features
 
     def _get_k2(self, system, new_system, indices):
         """Calculates the second order terms where the scalar mapping is the
@@ -478,22 +470,7 @@ class LMBTR(MBTR):
         sigma = grid["sigma"]
 
         # Determine the weighting function and possible radial cutoff
-        radial_cutoff = None
-        weighting = self.k2.get("weighting")
-        parameters = {}
-        if weighting is not None:
-            weighting_function = weighting["function"]
-            if weighting_function == "exponential" or weighting_function == "exp":
-                scale = weighting["scale"]
-                cutoff = weighting["cutoff"]
-                if scale != 0:
-                    radial_cutoff = -math.log(cutoff)/scale
-                parameters = {
-                    b"scale": weighting["scale"],
-                    b"cutoff": weighting["cutoff"]
-                }
-        else:
-            weighting_function = "unity"
+        weighting_function, parameters, radial_cutoff = self._get_weighting_setup(self.k2, 2)
 
         # Determine the geometry function
         geom_func_name = self.k2["geometry"]["function"]
@@ -538,7 +515,7 @@ class LMBTR(MBTR):
         # ones
         indices = np.append(indices, [n_atoms_ext+i for i in range(n_atoms_new-len(indices))])
 
-        k2_list = cmbtr.get_k2_local(
+        loc_ids, keys, gaussian_sums = cmbtr.get_k2_local(
             indices=indices,
             Z=ext_system.get_atomic_numbers(),
             distances=dmat_dense,
@@ -552,38 +529,23 @@ class LMBTR(MBTR):
             n=n,
         )
 
-        # Depending on flattening, use either a sparse matrix or a dense one.
+        # The spectra for all local centers are placed into the output with a
+        # single indexing operation. The location of each spectrum is given by
+        # the index of the local center and the index of the element that is
+        # paired with the center.
         n_elem = self.n_elements
         n_loc = len(indices)
-        if self.flatten:
-            k2 = lil_matrix(
-                (n_loc, n_elem*n), dtype=np.float32)
-
-            for i_loc, k2_map in enumerate(k2_list):
-                for key, gaussian_sum in k2_map.items():
-                    i = key[1]
-                    m = i
-                    start = int(m*n)
-                    end = int((m+1)*n)
-
-                    # Denormalize if requested
-                    if not self.normalize_gaussians:
-                        max_val = 1/(sigma*math.sqrt(2*math.pi))
-                        gaussian_sum /= max_val
-
-                    k2[i_loc, start:end] = gaussian_sum
-        else:
-            k2 = np.zeros((n_loc, n_elem, n), dtype=np.float32)
-            for i_loc, k2_map in enumerate(k2_list):
-                for key, gaussian_sum in k2_map.items():
-                    i = key[0]
+        k2 = np.zeros((n_loc, n_elem, n), dtype=np.float32)
+        k2[loc_ids, keys[:, 1], :] = gaussian_sums
 
-                    # Denormalize if requested
-                    if not self.normalize_gaussians:
-                        max_val = 1/(sigma*math.sqrt(2*math.pi))
-                        gaussian_sum /= max_val
+        # Denormalize if requested
+        if not self.normalize_gaussians:
+            max_val = 1/(sigma*math.sqrt(2*math.pi))
+            k2 /= max_val
 
-                    k2[i_loc, i, :] = gaussian_sum
+        # Depending on flattening, use either a flattened array or a tensor.
+        if self.flatten:
+            k2 = k2.reshape(n_loc, n_elem*n)
 
         return k2
 
@@ -601,22 +563,7 @@ class LMBTR(MBTR):
         sigma = grid["sigma"]
 
         # Determine the weighting function and possible radial cutoff
-        radial_cutoff = None
-        weighting = self.k3.get("weighting")
-        parameters = {}
-        if weighting is not None:
-            weighting_function = weighting["function"]
-            if weighting_function == "exponential" or weighting_function == "exp":
-                scale = weighting["scale"]
-                cutoff = weighting["cutoff"]
-                if scale != 0:
-                    radial_cutoff = -0.5*math.log(cutoff)/scale
-                parameters = {
-                    b"scale": scale,
-                    b"cutoff": cutoff
-                }
-        else:
-            weighting_function = "unity"
+        weighting_function, parameters, radial_cutoff = self._get_weighting_setup(self.k3, 3)
 
         # Determine the geometry function
         geom_func_name = self.k3["geometry"]["function"]
@@ -683,7 +630,7 @@ class LMBTR(MBTR):
 
         # If no weighting is used, the full distance matrix is calculated
         else:
-            dmat = scipy.sparse.lil_matrix((n_atoms_fin, n_atoms_fin))
+            dmat = np.zeros((n_atoms_fin, n_atoms_fin))
 
             # Fill in block for extended system
             dmat_ext_to_ext = ext_system.get_distance_matrix()
@@ -694,8 +641,9 @@ class LMBTR(MBTR):
             dmat[0:n_atoms_ext, n_atoms_ext:n_atoms_ext+n_atoms_new] = dmat_ext_to_new
             dmat[n_atoms_ext:n_atoms_ext+n_atoms_new, 0:n_atoms_ext] = dmat_ext_to_new.T
 
-            # Calculate adjacencies and the dense version
-            dmat = dmat.tocoo()
+            # Calculate adjacencies and the dense version. Only the nonzero
+            # distances are included in the sparse form.
+            dmat = scipy.sparse.coo_matrix(dmat)
             adj_list = dscribe.utils.geometry.get_adjacency_list(dmat)
             dmat_dense = np.full((n_atoms_fin, n_atoms_fin), sys.float_info.max)  # The non-neighbor values are treated as "infinitely far".
             dmat_dense[dmat.row, dmat.col] = dmat.data
@@ -704,7 +652,7 @@ class LMBTR(MBTR):
         # ones
         indices = np.append(indices, [n_atoms_ext+i for i in range(n_atoms_new)])
 
-        k3_list = cmbtr.get_k3_local(
+        loc_ids, keys, gaussian_sums = cmbtr.get_k3_local(
             Z=fin_system.get_atomic_numbers(),
             distances=dmat_dense,
             neighbours=adj_list,
@@ -718,52 +666,37 @@ class LMBTR(MBTR):
             n=n,
         )
 
-        # Depending on flattening, use either a sparse matrix or a dense one.
+        # The spectra for all local centers are placed into the output with a
+        # single indexing operation
         n_elem = self.n_elements
         n_loc = len(indices)
         if self.flatten:
-            k3 = lil_matrix(
-                (n_loc, int((n_elem*(3*n_elem-1)*n/2))), dtype=np.float32
-            )
-
-            for i_loc, k3_map in enumerate(k3_list):
-                for key, gaussian_sum in k3_map.items():
-                    i = key[0]
-                    j = key[1]
-                    k = key[2]
-
-                    # This is the index of the spectrum. It is given by enumerating the
-                    # elements of a three-dimensional array and only considering
-                    # elements for which k>=i and i || j == 0. The enumeration begins
-                    # from [0, 0, 0], and ends at [n_elem, n_elem, n_elem], looping the
-                    # elements in the order k, i, j.
-                    if j == 0:
-                        m = k + i*n_elem - i*(i+1)/2
-                    else:
-                        m = n_elem*(n_elem+1)/2+(j-1)*n_elem + k
-                    start = int(m*n)
-                    end = int((m+1)*n)
-
-                    # Denormalize if requested
-                    if not self.normalize_gaussians:
-                        max_val = 1/(sigma*math.sqrt(2*math.pi))
-                        gaussian_sum /= max_val
-
-                    k3[i_loc, start:end] = gaussian_sum
+            k3 = np.zeros((n_loc, n_elem*(3*n_elem-1)*n//2), dtype=np.float32)
         else:
             k3 = np.zeros((n_loc, n_elem, n_elem, n_elem, n), dtype=np.float32)
-            for i_loc, k3_map in enumerate(k3_list):
-                for key, gaussian_sum in k3_map.items():
-                    i = key[0]
-                    j = key[1]
-                    k = key[2]
-
-                    # Denormalize if requested
-                    if not self.normalize_gaussians:
-                        max_val = 1/(sigma*math.sqrt(2*math.pi))
-                        gaussian_sum /= max_val
-
-                    k3[i_loc, i, j, k, :] = gaussian_sum
+        i = keys[:, 0]
+        j = keys[:, 1]
+        k = keys[:, 2]
+        if self.flatten:
+            # This is the index of the spectrum. It is given by enumerating
+            # the elements of a three-dimensional array and only
+            # considering elements for which k>=i and i || j == 0. The
+            # enumeration begins from [0, 0, 0], and ends at [n_elem,
+            # n_elem, n_elem], looping the elements in the order k, i, j.
+            m = np.where(
+                j == 0,
+                k + i*n_elem - i*(i+1)//2,
+                n_elem*(n_elem+1)//2+(j-1)*n_elem + k
+            )
+            k3.reshape(n_loc, -1, n)[loc_ids, m] = gaussian_sums
+        else:
+            k3[loc_ids, i, j, k, :] = gaussian_sums
+
+        # Denormalize if requested
+        if not self.normalize_gaussians:
+            max_val = 1/(sigma*math.sqrt(2*math.pi))
+            k3 /= max_val
+
         return k3
 
     def get_location(self, species):
@@ -816,8 +749,8 @@ class LMBTR(MBTR):
             n2 = self.k2["grid"]["n"]
             j = numbers[1]
             m = j
-            start = int(m*n2)
-            end = int((m+1)*n2)
+            start = m*n2
+            end = (m+1)*n2
 
         # k=3
         if len(numbers) == 3:
@@ -835,16 +768,16 @@ class LMBTR(MBTR):
             # from [0, 0, 0], and ends at [n_elem, n_elem, n_elem], looping the
             # elements in the order k, i, j.
             if j == 0:
-                m = k + i*n_elem - i*(i+1)/2
+                m = k + i*n_elem - i*(i+1)//2
             else:
-                m = n_elem*(n_elem+1)/2+(j-1)*n_elem + k
+                m = n_elem*(n_elem+1)//2+(j-1)*n_elem + k
 
             offset = 0
             if self.k2 is not None:
                 n2 = self.k2["grid"]["n"]
                 offset += n_elem*n2
-            start = int(offset+m*n3)
-            end = int(offset+(m+1)*n3)
+            start = offset+m*n3
+            end = offset+(m+1)*n3
 
         return slice(start, end)
 
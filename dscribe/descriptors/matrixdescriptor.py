@@ -21,11 +21,19 @@ from scipy.sparse import coo_matrix
 from dscribe.descriptors import Descriptor
 from abc import abstractmethod
 
+# The diagonal elements 0.5*Z**2.4 of the Coulomb and Sine matrices for every
+# atomic number. They are looked up with the atomic numbers instead of being
+# recalculated for each system.
+DIAGONAL_VALUES = 0.5 * np.arange(119, dtype=np.float64) ** 2.4
+DIAGONAL_VALUES.flags.writeable = False
+
 
 class MatrixDescriptor(Descriptor):
     """A common base class for two-body matrix-like descriptors.
     """
-    def __init__(self, n_atoms_max, permutation="sorted_l2", sigma=None, seed=None, flatten=True, sparse=False):
+    _dtype_options = [None, "float32", "float64"]
+
+    def __init__(self, n_atoms_max, permutation="sorted_l2", sigma=None, seed=None, flatten=True, sparse=False, dtype=None):
         """
         Args:
             n_atoms_max (int): The maximum nuber of atoms that any of the
@@ -53,8 +61,18 @@ class MatrixDescriptor(Descriptor):
                 to a 1D array.
             sparse (bool): Whether the output should be a sparse matrix or a
                 dense numpy array.
+            dtype (str): The data type of the output. The Coulomb and Sine
+                matrices are also constructed in this precision. The available
+                options are:
+
+                    * None: A single system is returned in double precision
+                      and multiple systems in single precision.
+                    * "float32": Single precision floating point numbers.
+                    * "float64": Double precision floating point numbers.
+
+                Defaults to None.
         """
-        super().__init__(periodic=False, flatten=flatten, sparse=sparse)
+        super().__init__(periodic=False, flatten=flatten, sparse=sparse, dtype=dtype)
 
         # Check parameter validity
         if n_atoms_max <= 0:
@@ -86,6 +104,14 @@ class MatrixDescriptor(Descriptor):
         self._norm_vector = None
         self.sigma = sigma
 
+    def _get_matrix_dtype(self):
+        """Used to get the data type in which the matrices are constructed.
+
+        Returns:
+            str: The data type of the matrix.
+        """
+        return "float64" if self.dtype is None else self.dtype
+
     @abstractmethod
     def get_matrix(self, system):
         """Used to get the final matrix for this descriptor.
@@ -113,6 +139,8 @@ class MatrixDescriptor(Descriptor):
         self._norm_vector = None
 
         matrix = self.get_matrix(system)
+        if self.dtype is not None:
+            matrix = matrix.astype(self.dtype, copy=False)
 
         # Handle the permutation option
         if self.permutation == "none":
@@ -147,11 +175,14 @@ class MatrixDescriptor(Descriptor):
             np.ndarray: The sorted matrix.
         """
         # Sort the atoms such that the norms of the rows are in descending
-        # order
-        norms = np.linalg.norm(matrix, axis=1)
-        sorted_indices = np.argsort(norms, axis=0)[::-1]
-        sorted_matrix = matrix[sorted_indices]
-        sorted_matrix = sorted_matrix[:, sorted_indices]
+        # order. The ordering is the same for the squared norms, so the square
+        # root is not taken. Sorting the negated norms gives the descending
+        # order directly as a contiguous index array.
+        norms_squared = np.einsum("ij,ij->i", matrix, matrix)
+        sorted_indices = np.argsort(-norms_squared)
+
+        # The rows and columns are permuted with a single gather
+        sorted_matrix = matrix[np.ix_(sorted_indices, sorted_indices)]
 
         return sorted_matrix
 
@@ -171,8 +202,8 @@ class MatrixDescriptor(Descriptor):
         # Remove sign
         abs_values = np.absolute(eigenvalues)
 
-        # Get ordering that sorts the values by absolute value
-        sorted_indices = np.argsort(abs_values)[::-1]  # This sorts the list in descending order in place
+        # Get ordering that sorts the values by descending absolute value
+        sorted_indices = np.argsort(-abs_values)
         eigenvalues = eigenvalues[sorted_indices]
 
         return eigenvalues
@@ -186,10 +217,18 @@ class MatrixDescriptor(Descriptor):
         Returns:
             np.ndarray: The zero-padded array.
         """
-        # Pad with zeros
+        # Pad with zeros. The padded array is allocated directly and the
+        # original values are copied into its beginning, which is much faster
+        # than the generic np.pad.
         n_atoms = array.shape[0]
         n_dim = array.ndim
-        padded = np.pad(array, [(0, self.n_atoms_max-n_atoms)]*n_dim, 'constant')
+        if n_atoms > self.n_atoms_max:
+            raise ValueError(
+                "The system has {} atoms, which is more than the given "
+                "n_atoms_max={}.".format(n_atoms, self.n_atoms_max)
+            )
+        padded = np.zeros((self.n_atoms_max,)*n_dim, dtype=array.dtype)
+        padded[(slice(0, n_atoms),)*n_dim] = array
 
         return padded
 
@@ -223,10 +262,9 @@ class MatrixDescriptor(Descriptor):
         """
         norm_vector = self._get_norm_vector(matrix)
         noise_norm_vector = self.random_state.normal(norm_vector, sigma)
-        indexlist = np.argsort(noise_norm_vector)
-        indexlist = indexlist[::-1]  # Order highest to lowest
+        indexlist = np.argsort(-noise_norm_vector)  # Order highest to lowest
 
-        matrix = matrix[indexlist][:, indexlist]
+        matrix = matrix[np.ix_(indexlist, indexlist)]
 
         return matrix
 
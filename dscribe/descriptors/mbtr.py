@@ -13,11 +13,14 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import os
 import sys
 import math
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
-from scipy.sparse import lil_matrix, coo_matrix
+from scipy.sparse import coo_matrix
 
 from ase import Atoms
 import ase.data
@@ -27,6 +30,28 @@ from dscribe.descriptors import Descriptor
 from dscribe.libmbtr.mbtrwrapper import MBTRWrapper
 import dscribe.utils.geometry
 
+# A thread pool shared by all the MBTR instances for calculating the terms
+# concurrently. Starting a new pool for each system would cost more than the
+# terms of a small molecule, so the pool is kept alive. It is created on first
+# use and recreated in forked processes, because the threads of the parent
+# process do not exist in the child. The idle workers are joined by
+# concurrent.futures when the interpreter exits.
+_executor = None
+_executor_pid = None
+
+
+def _get_executor():
+    """Used to get the thread pool for calculating the MBTR terms.
+
+    Returns:
+        ThreadPoolExecutor: A thread pool with one worker for each term.
+    """
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=3)
+        _executor_pid = os.getpid()
+    return _executor
+
 
 class MBTR(Descriptor):
     """Implementation of the Many-body tensor representation up to :math:`k=3`.
@@ -113,7 +138,8 @@ class MBTR(Descriptor):
             normalize_gaussians=True,
             normalization="none",
             flatten=True,
-            sparse=False
+            sparse=False,
+            dtype="float32",
             ):
         """
         Args:
@@ -173,6 +199,12 @@ class MBTR(Descriptor):
                 "k3":
             sparse (bool): Whether the output should be a sparse matrix or a
                 dense numpy array.
+            dtype (str): The data type of the output. The available options
+                are "float16", "float32" and "float64". The terms are always
+                calculated in single precision and only the final output is
+                converted. Defaults to "float32". The half precision output is
+                meant to reduce the storage and memory bandwidth of large
+                datasets, and is only available for dense output.
         """
         if sparse and not flatten:
             raise ValueError(
@@ -181,7 +213,7 @@ class MBTR(Descriptor):
                 "non-flattened output, please specify sparse=False in the MBTR"
                 "constructor."
             )
-        super().__init__(periodic=periodic, flatten=flatten, sparse=sparse)
+        super().__init__(periodic=periodic, flatten=flatten, sparse=sparse, dtype=dtype)
         self.system = None
         self.k1 = k1
         self.k2 = k2
@@ -381,6 +413,43 @@ class MBTR(Descriptor):
             self.check_grid(value["grid"])
         self._k3 = value
 
+    def _get_weighting_setup(self, setup, k):
+        """Used to determine the weighting function, the weighting parameters
+        and the possible radial cutoff for a term.
+
+        Args:
+            setup(dict): The setup for the term.
+            k(int): The degree of the term.
+
+        Returns:
+            tuple: The name of the weighting function, a dictionary of
+            weighting parameters for the C++ extension and the radial cutoff.
+            The radial cutoff is None if no cutoff is used.
+        """
+        radial_cutoff = None
+        parameters = {}
+        weighting = setup.get("weighting")
+        if weighting is not None:
+            weighting_function = weighting["function"]
+            if weighting_function == "exponential" or weighting_function == "exp":
+                scale = weighting["scale"]
+                cutoff = weighting["cutoff"]
+
+                # For k=3 the weighted distance is A->B->C->A, which is at
+                # least twice the distance of any two atoms in the triplet.
+                if scale != 0:
+                    radial_cutoff = -math.log(cutoff)/scale
+                    if k == 3:
+                        radial_cutoff *= 0.5
+                parameters = {
+                    b"scale": scale,
+                    b"cutoff": cutoff
+                }
+        else:
+            weighting_function = "unity"
+
+        return weighting_function, parameters, radial_cutoff
+
     @property
     def species(self):
         return self._species
@@ -490,8 +559,11 @@ class MBTR(Descriptor):
         if isinstance(system, (Atoms, System)):
             return self.create_single(system)
 
-        # Combine input arguments
-        inp = [(i_sys,) for i_sys in system]
+        # Combine input arguments. When the systems are distributed over
+        # multiple jobs, the terms of each system are not additionally
+        # calculated in threads, as that would oversubscribe the cores.
+        use_threads = n_jobs == 1
+        inp = [(i_sys, use_threads) for i_sys in system]
 
         # Here we precalculate the size for each job to preallocate memory.
         if self.flatten:
@@ -507,11 +579,13 @@ class MBTR(Descriptor):
 
         return output
 
-    def create_single(self, system):
+    def create_single(self, system, use_threads=True):
         """Return the many-body tensor representation for the given system.
 
         Args:
             system (:class:`ase.Atoms` | :class:`.System`): Input system.
+            use_threads (bool): Whether the k-terms may be calculated
+                concurrently in threads on multi-core machines.
 
         Returns:
             dict | np.ndarray | scipy.sparse.coo_matrix: The return type is
@@ -532,59 +606,64 @@ class MBTR(Descriptor):
         # of atomic numbers
         self.check_atomic_numbers(system.get_atomic_numbers())
 
-        mbtr = {}
+        # For flattened output a single vector is allocated and each term is
+        # written directly into its own slice of it, in the order k1, k2, k3.
+        outputs = {}
+        if self.flatten:
+            n_elem = self.n_elements
+            output = np.zeros((1, self.get_number_of_features()), dtype=np.float32)
+            offset = 0
+            for key, n_combinations in [
+                    ("k1", n_elem),
+                    ("k2", n_elem*(n_elem+1)//2),
+                    ("k3", n_elem*n_elem*(n_elem+1)//2)]:
+                term = getattr(self, key)
+                if term is not None:
+                    size = n_combinations*term["grid"]["n"]
+                    outputs[key] = output[:, offset:offset+size]
+                    offset += size
+
+        # The terms are independent of each other and the C++ extension
+        # releases the GIL, so on multi-core machines multiple terms are
+        # calculated concurrently in threads unless disabled. Each term writes
+        # only into its own output.
+        terms = []
         if self.k1 is not None:
-            mbtr["k1"] = self._get_k1(system)
+            terms.append(("k1", self._get_k1))
         if self.k2 is not None:
-            mbtr["k2"] = self._get_k2(system)
+            terms.append(("k2", self._get_k2))
         if self.k3 is not None:
-            mbtr["k3"] = self._get_k3(system)
+            terms.append(("k3", self._get_k3))
+        if use_threads and len(terms) > 1 and (os.cpu_count() or 1) > 1:
+            executor = _get_executor()
+            futures = [(key, executor.submit(func, system, out=outputs.get(key))) for key, func in terms]
+            mbtr = {key: future.result() for key, future in futures}
+        else:
+            mbtr = {key: func(system, out=outputs.get(key)) for key, func in terms}
 
-        # Handle normalization
+        # Handle normalization. The terms are normalized in place so that the
+        # flattened output vector is updated as well.
         if self.normalization == "l2_each":
-            if self.flatten is True:
-                for key, value in mbtr.items():
-                    i_data = np.array(value.tocsr().data)
-                    i_norm = np.linalg.norm(i_data)
-                    mbtr[key] = value/i_norm
-            else:
-                for key, value in mbtr.items():
-                    i_data = value.ravel()
-                    i_norm = np.linalg.norm(i_data)
-                    mbtr[key] = value/i_norm
+            for key, value in mbtr.items():
+                i_data = value.ravel()
+                i_norm = np.linalg.norm(i_data)
+                if i_norm != 0:
+                    value /= i_norm
         elif self.normalization == "n_atoms":
             n_atoms = len(self.system)
-            if self.flatten is True:
-                for key, value in mbtr.items():
-                    mbtr[key] = value/n_atoms
-            else:
-                for key, value in mbtr.items():
-                    mbtr[key] = value/n_atoms
-
-        # Flatten output if requested
+            for key, value in mbtr.items():
+                value /= n_atoms
+
+        # Return the flattened vector if requested. It is only converted to the
+        # output data type and turned into a sparse matrix at the very end.
         if self.flatten:
-            length = 0
-
-            datas = []
-            rows = []
-            cols = []
-            for key in sorted(mbtr.keys()):
-                tensor = mbtr[key]
-                size = tensor.shape[1]
-                coo = tensor.tocoo()
-                datas.append(coo.data)
-                rows.append(coo.row)
-                cols.append(coo.col + length)
-                length += size
-
-            datas = np.concatenate(datas)
-            rows = np.concatenate(rows)
-            cols = np.concatenate(cols)
-            mbtr = coo_matrix((datas, (rows, cols)), shape=[1, length], dtype=np.float32)
-
-            # Make into a dense array if requested
-            if not self.sparse:
-                mbtr = mbtr.toarray()
+            mbtr = output.astype(self.dtype, copy=False)
+
+            if self.sparse:
+                mbtr = coo_matrix(mbtr)
+        else:
+            for key, value in mbtr.items():
+                mbtr[key] = value.astype(self.dtype, copy=False)
 
         return mbtr
 
@@ -604,14 +683,14 @@ class MBTR(Descriptor):
             n_features += n_k1
         if self.k2 is not None:
             n_k2_grid = self.k2["grid"]["n"]
-            n_k2 = (n_elem*(n_elem+1)/2)*n_k2_grid
+            n_k2 = (n_elem*(n_elem+1)//2)*n_k2_grid
             n_features += n_k2
         if self.k3 is not None:
             n_k3_grid = self.k3["grid"]["n"]
-            n_k3 = (n_elem*n_elem*(n_elem+1)/2)*n_k3_grid
+            n_k3 = (n_elem*n_elem*(n_elem+1)//2)*n_k3_grid
             n_features += n_k3
 
-        return int(n_features)
+        return n_features
 
     def get_location(self, species):
         """Can be used to query the location of a species combination in the
@@ -659,8 +738,8 @@ class MBTR(Descriptor):
             n1 = self.k1["grid"]["n"]
             i = numbers[0]
             m = i
-            start = int(m*n1)
-            end = int((m+1)*n1)
+            start = m*n1
+            end = (m+1)*n1
 
         # k=2
         if len(numbers) == 2:
@@ -674,14 +753,14 @@ class MBTR(Descriptor):
             # This is the index of the spectrum. It is given by enumerating the
             # elements of an upper triangular matrix from left to right and top
             # to bottom.
-            m = j + i*n_elem - i*(i+1)/2
+            m = j + i*n_elem - i*(i+1)//2
 
             offset = 0
             if self.k1 is not None:
                 n1 = self.k1["grid"]["n"]
                 offset += n_elem*n1
-            start = int(offset+m*n2)
-            end = int(offset+(m+1)*n2)
+            start = offset+m*n2
+            end = offset+(m+1)*n2
 
         # k=3
         if len(numbers) == 3:
@@ -697,7 +776,7 @@ class MBTR(Descriptor):
             # elements of a three-dimensional array where for valid elements
             # k>=i. The enumeration begins from [0, 0, 0], and ends at [n_elem,
             # n_elem, n_elem], looping the elements in the order k, i, j.
-            m = j*n_elem*(n_elem+1)/2 + k + i*n_elem - i*(i+1)/2
+            m = j*n_elem*(n_elem+1)//2 + k + i*n_elem - i*(i+1)//2
 
             offset = 0
             if self.k1 is not None:
@@ -705,16 +784,22 @@ class MBTR(Descriptor):
                 offset += n_elem*n1
             if self.k2 is not None:
                 n2 = self.k2["grid"]["n"]
-                offset += (n_elem*(n_elem+1)/2)*n2
-            start = int(offset+m*n3)
-            end = int(offset+(m+1)*n3)
+                offset += (n_elem*(n_elem+1)//2)*n2
+            start = offset+m*n3
+            end = offset+(m+1)*n3
 
         return slice(start, end)
 
-    def _get_k1(self, system):
+    def _get_k1(self, system, out=None):
         """Calculates the second order terms where the scalar mapping is the
         inverse distance between atoms.
 
+        Args:
+            system(:class:`.System`): The system for which the term is
+                calculated.
+            out(np.ndarray): Optional array into which the flattened term is
+                written. Only used for flattened output.
+
         Returns:
             1D ndarray: flattened K2 values.
         """
@@ -733,7 +818,7 @@ class MBTR(Descriptor):
             indices=np.zeros((len(system), 3), dtype=int)
         )
 
-        k1_map = cmbtr.get_k1(
+        keys, gaussian_sums = cmbtr.get_k1(
             system.get_atomic_numbers(),
             geom_func=geom_func_name.encode(),
             weight_func=b"unity",
@@ -744,34 +829,40 @@ class MBTR(Descriptor):
             n=n,
         )
 
-        # Depending on flattening, use either a sparse matrix or a dense one.
+        # Depending on flattening, use either a flattened vector or a tensor.
         n_elem = self.n_elements
         if self.flatten:
-            k1 = lil_matrix((1, n_elem*n), dtype=np.float32)
+            k1 = np.zeros((1, n_elem*n), dtype=np.float32) if out is None else out
         else:
             k1 = np.zeros((n_elem, n), dtype=np.float32)
 
-        for key, gaussian_sum in k1_map.items():
-            i = key[0]
-
-            # Denormalize if requested
-            if not self.normalize_gaussians:
-                max_val = 1/(sigma*math.sqrt(2*math.pi))
-                gaussian_sum /= max_val
+        # All the spectra are placed into the output with a single indexing
+        # operation. The flattened output is indexed with explicit flat
+        # indices instead of through a reshaped view, so that the spectra are
+        # written into the given output array whatever its memory layout.
+        i = keys[:, 0]
+        if self.flatten:
+            k1[0, i[:, None]*n + np.arange(n)] = gaussian_sums
+        else:
+            k1[i, :] = gaussian_sums
 
-            if self.flatten:
-                start = i*n
-                end = (i+1)*n
-                k1[0, start:end] = gaussian_sum
-            else:
-                k1[i, :] = gaussian_sum
+        # Denormalize if requested
+        if not self.normalize_gaussians:
+            max_val = 1/(sigma*math.sqrt(2*math.pi))
+            k1 /= max_val
 
         return k1
 
-    def _get_k2(self, system):
+    def _get_k2(self, system, out=None):
         """Calculates the second order terms where the scalar mapping is the
         inverse distance between atoms.
 
+        Args:
+            system(:class:`.System`): The system for which the term is
+                calculated.
+            out(np.ndarray): Optional array into which the flattened term is
+                written. Only used for flattened output.
+
         Returns:
             1D ndarray: flattened K2 values.
         """
@@ -781,22 +872,7 @@ class MBTR(Descriptor):
         n = grid["n"]
         sigma = grid["sigma"]
         # Determine the weighting function and possible radial cutoff
-        radial_cutoff = None
-        weighting = self.k2.get("weighting")
-        parameters = {}
-        if weighting is not None:
-            weighting_function = weighting["function"]
-            if weighting_function == "exponential" or weighting_function == "exp":
-                scale = weighting["scale"]
-                cutoff = weighting["cutoff"]
-                if scale != 0:
-                    radial_cutoff = -math.log(cutoff)/scale
-                parameters = {
-                    b"scale": scale,
-                    b"cutoff": cutoff
-                }
-        else:
-            weighting_function = "unity"
+        weighting_function, parameters, radial_cutoff = self._get_weighting_setup(self.k2, 2)
 
         # Determine the geometry function
         geom_func_name = self.k2["geometry"]["function"]
@@ -835,7 +911,7 @@ class MBTR(Descriptor):
             dmat_dense = ext_system.get_distance_matrix()
             adj_list = np.tile(np.arange(n_atoms), (n_atoms, 1))
 
-        k2_map = cmbtr.get_k2(
+        keys, gaussian_sums = cmbtr.get_k2(
             ext_system.get_atomic_numbers(),
             distances=dmat_dense,
             neighbours=adj_list,
@@ -848,40 +924,44 @@ class MBTR(Descriptor):
             n=n,
         )
 
-        # Depending of flattening, use either a sparse matrix or a dense one.
+        # Depending of flattening, use either a flattened vector or a tensor.
         n_elem = self.n_elements
         if self.flatten:
-            k2 = lil_matrix(
-                (1, int(n_elem*(n_elem+1)/2*n)), dtype=np.float32)
+            k2 = np.zeros((1, n_elem*(n_elem+1)//2*n), dtype=np.float32) if out is None else out
         else:
             k2 = np.zeros((self.n_elements, self.n_elements, n), dtype=np.float32)
 
-        for key, gaussian_sum in k2_map.items():
-            i = key[0]
-            j = key[1]
-
-            # This is the index of the spectrum. It is given by enumerating the
-            # elements of an upper triangular matrix from left to right and top
-            # to bottom.
-            m = int(j + i*n_elem - i*(i+1)/2)
-
-            # Denormalize if requested
-            if not self.normalize_gaussians:
-                max_val = 1/(sigma*math.sqrt(2*math.pi))
-                gaussian_sum /= max_val
+        # All the spectra are placed into the output with a single indexing
+        # operation. The flattened output is indexed with explicit flat
+        # indices instead of through a reshaped view, so that the spectra are
+        # written into the given output array whatever its memory layout.
+        i = keys[:, 0]
+        j = keys[:, 1]
+        if self.flatten:
+            # This is the index of the spectrum. It is given by enumerating
+            # the elements of an upper triangular matrix from left to right
+            # and top to bottom.
+            m = j + i*n_elem - i*(i+1)//2
+            k2[0, m[:, None]*n + np.arange(n)] = gaussian_sums
+        else:
+            k2[i, j, :] = gaussian_sums
 
-            if self.flatten:
-                start = m*n
-                end = (m + 1)*n
-                k2[0, start:end] = gaussian_sum
-            else:
-                k2[i, j, :] = gaussian_sum
+        # Denormalize if requested
+        if not self.normalize_gaussians:
+            max_val = 1/(sigma*math.sqrt(2*math.pi))
+            k2 /= max_val
 
         return k2
 
-    def _get_k3(self, system):
+    def _get_k3(self, system, out=None):
         """Calculates the third order terms.
 
+        Args:
+            system(:class:`.System`): The system for which the term is
+                calculated.
+            out(np.ndarray): Optional array into which the flattened term is
+                written. Only used for flattened output.
+
         Returns:
             1D ndarray: flattened K3 values.
         """
@@ -892,22 +972,7 @@ class MBTR(Descriptor):
         sigma = grid["sigma"]
 
         # Determine the weighting function and possible radial cutoff
-        radial_cutoff = None
-        weighting = self.k3.get("weighting")
-        parameters = {}
-        if weighting is not None:
-            weighting_function = weighting["function"]
-            if weighting_function == "exponential" or weighting_function == "exp":
-                scale = weighting["scale"]
-                cutoff = weighting["cutoff"]
-                if scale != 0:
-                    radial_cutoff = -0.5*math.log(cutoff)/scale
-                parameters = {
-                    b"scale": scale,
-                    b"cutoff": cutoff
-                }
-        else:
-            weighting_function = "unity"
+        weighting_function, parameters, radial_cutoff = self._get_weighting_setup(self.k3, 3)
 
         # Determine the geometry function
         geom_func_name = self.k3["geometry"]["function"]
@@ -946,7 +1011,7 @@ class MBTR(Descriptor):
             dmat_dense = ext_system.get_distance_matrix()
             adj_list = np.tile(np.arange(n_atoms), (n_atoms, 1))
 
-        k3_map = cmbtr.get_k3(
+        keys, gaussian_sums = cmbtr.get_k3(
             ext_system.get_atomic_numbers(),
             distances=dmat_dense,
             neighbours=adj_list,
@@ -959,36 +1024,34 @@ class MBTR(Descriptor):
             n=n,
         )
 
-        # Depending of flattening, use either a sparse matrix or a dense one.
+        # Depending of flattening, use either a flattened vector or a tensor.
         n_elem = self.n_elements
         if self.flatten:
-            k3 = lil_matrix(
-                (1, int(n_elem*n_elem*(n_elem+1)/2*n)), dtype=np.float32
-            )
+            k3 = np.zeros((1, n_elem*n_elem*(n_elem+1)//2*n), dtype=np.float32) if out is None else out
         else:
             k3 = np.zeros((n_elem, n_elem, n_elem, n), dtype=np.float32)
 
-        for key, gaussian_sum in k3_map.items():
-            i = key[0]
-            j = key[1]
-            k = key[2]
+        # All the spectra are placed into the output with a single indexing
+        # operation. The flattened output is indexed with explicit flat
+        # indices instead of through a reshaped view, so that the spectra are
+        # written into the given output array whatever its memory layout.
+        i = keys[:, 0]
+        j = keys[:, 1]
+        k = keys[:, 2]
+        if self.flatten:
+            # This is the index of the spectrum. It is given by enumerating
+            # the elements of a three-dimensional array where for valid
+            # elements k>=i. The enumeration begins from [0, 0, 0], and
+            # ends at [n_elem, n_elem, n_elem], looping the elements in the
+            # order j, i, k.
+            m = j*n_elem*(n_elem+1)//2 + k + i*n_elem - i*(i+1)//2
+            k3[0, m[:, None]*n + np.arange(n)] = gaussian_sums
+        else:
+            k3[i, j, k, :] = gaussian_sums
 
-            # This is the index of the spectrum. It is given by enumerating the
-            # elements of a three-dimensional array where for valid elements
-            # k>=i. The enumeration begins from [0, 0, 0], and ends at [n_elem,
-            # n_elem, n_elem], looping the elements in the order j, i, k.
-            m = int(j*n_elem*(n_elem+1)/2 + k + i*n_elem - i*(i+1)/2)
-
-            # Denormalize if requested
-            if not self.normalize_gaussians:
-                max_val = 1/(sigma*math.sqrt(2*math.pi))
-                gaussian_sum /= max_val
-
-            if self.flatten:
-                start = m*n
-                end = (m+1)*n
-                k3[0, start:end] = gaussian_sum
-            else:
-                k3[i, j, k, :] = gaussian_sum
+        # Denormalize if requested
+        if not self.normalize_gaussians:
+            max_val = 1/(sigma*math.sqrt(2*math.pi))
+            k3 /= max_val
 
         return k3
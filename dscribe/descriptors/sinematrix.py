@@ -18,7 +18,7 @@ import numpy as np
 from ase import Atoms
 
 from dscribe.core import System
-from dscribe.descriptors.matrixdescriptor import MatrixDescriptor
+from dscribe.descriptors.matrixdescriptor import MatrixDescriptor, DIAGONAL_VALUES
 
 
 class SineMatrix(MatrixDescriptor):
@@ -108,22 +108,33 @@ class SineMatrix(MatrixDescriptor):
         # Difference vectors as a 3D tensor
         diff_tensor = system.get_displacement_tensor()
 
-        # Calculate phi
-        arg_to_sin = np.pi * np.dot(diff_tensor, B_inv)
-        phi = np.linalg.norm(np.dot(np.sin(arg_to_sin)**2, B), axis=2)
-
+        # Calculate phi. The intermediate NxNx3 tensor is reused in place for
+        # the scaling, sine and squaring steps.
+        arg_to_sin = np.dot(diff_tensor, B_inv)
+        arg_to_sin *= np.pi
+        sin_squared = np.sin(arg_to_sin, out=arg_to_sin)
+        sin_squared *= sin_squared
+        v = np.dot(sin_squared, B)
+        phi = np.sqrt(np.einsum("ijk,ijk->ij", v, v))
+
+        # The diagonal is overwritten at the end, so it is set to one before
+        # taking the reciprocal to avoid the division by zero. Atoms that are
+        # periodic copies of each other still give an infinite value.
+        np.fill_diagonal(phi, 1)
         with np.errstate(divide='ignore'):
-            phi = np.reciprocal(phi)
+            np.reciprocal(phi, out=phi)
 
-        # Calculate Z_i*Z_j
-        q = system.get_atomic_numbers()
-        qiqj = q[None, :]*q[:, None]
-        np.fill_diagonal(phi, 0)
+        z = system.get_atomic_numbers()
+        q = z.astype(self._get_matrix_dtype())
+        phi = phi.astype(self._get_matrix_dtype(), copy=False)
 
-        # Multiply by charges
-        smat = qiqj*phi
+        # Multiply by charges. The matrix is not shared, so this is done in
+        # place.
+        smat = phi
+        smat *= q[None, :]
+        smat *= q[:, None]
 
         # Set diagonal
-        np.fill_diagonal(smat, 0.5 * q ** 2.4)
+        np.fill_diagonal(smat, DIAGONAL_VALUES[z])
 
         return smat
@@ -14,10 +14,56 @@
 using namespace std;
 
 MBTR::MBTR(map<int,int> atomicNumberToIndexMap, int interactionLimit, vector<vector<int>> cellIndices)
-    : atomicNumberToIndexMap(atomicNumberToIndexMap)
-    , interactionLimit(interactionLimit)
+    : interactionLimit(interactionLimit)
     , cellIndices(cellIndices)
 {
+    // The mapping is queried for every pair and triplet, so it is stored as a
+    // lookup table indexed directly by the atomic number. Atomic numbers that
+    // are not part of the mapping are marked with -1.
+    int maxAtomicNumber = atomicNumberToIndexMap.empty() ? -1 : atomicNumberToIndexMap.rbegin()->first;
+    this->atomicNumberToIndexTable = vector<int>(maxAtomicNumber+1, -1);
+    for (const auto &item : atomicNumberToIndexMap) {
+        this->atomicNumberToIndexTable[item.first] = item.second;
+    }
+}
+
+inline int MBTR::getElementIndex(const int &atomicNumber)
+{
+    if (atomicNumber < 0 || atomicNumber >= (int)this->atomicNumberToIndexTable.size() || this->atomicNumberToIndexTable[atomicNumber] == -1) {
+        throw out_of_range("Atomic number not included in the mapping.");
+    }
+    return this->atomicNumberToIndexTable[atomicNumber];
+}
+
+map<string, vector<float>> MBTR::toStringKeys(map<index2d, vector<float>> &indexMap)
+{
+    // The keys are formed as strings to enable passing them through cython.
+    // This is done only once per element pair instead of once per
+    // contribution.
+    map<string, vector<float>> stringMap;
+    for (auto &item : indexMap) {
+        stringstream ss;
+        ss << get<0>(item.first);
+        ss << ",";
+        ss << get<1>(item.first);
+        stringMap[ss.str()] = move(item.second);
+    }
+    return stringMap;
+}
+
+map<string, vector<float>> MBTR::toStringKeys(map<index3d, vector<float>> &indexMap)
+{
+    map<string, vector<float>> stringMap;
+    for (auto &item : indexMap) {
+        stringstream ss;
+        ss << get<0>(item.first);
+        ss << ",";
+        ss << get<1>(item.first);
+        ss << ",";
+        ss << get<2>(item.first);
+        stringMap[ss.str()] = move(item.second);
+    }
+    return stringMap;
 }
 
 map<string, vector<float>> MBTR::getK1(const vector<int> &Z, const string &geomFunc, const string &weightFunc, const map<string, float> &parameters, float min, float max, float sigma, int n)
@@ -48,24 +94,19 @@ map<string, vector<float>> MBTR::getK1(const vector<int> &Z, const string &geomF
                 throw invalid_argument("Invalid weighting function.");
             }
 
-            // Calculate gaussian
-            vector<float> gauss = gaussian(geom, weight, start, dx, sigmasqrt2, n);
-
             // Get the index of the present elements in the final vector
             int i_elem = Z[i];
-            int i_index = this->atomicNumberToIndexMap.at(i_elem);
+            int i_index = this->getElementIndex(i_elem);
 
             // Form the key as string to enable passing it through cython
             string stringKey = to_string(i_index);
 
-            // Sum gaussian into output
-            auto it = k1Map.find(stringKey);
-            if ( it == k1Map.end() ) {
-                k1Map[stringKey] = gauss;
-            } else {
-                vector<float> &old = it->second;
-                transform(old.begin(), old.end(), gauss.begin(), old.begin(), plus<float>());
+            // Sum the gaussian directly into the output
+            vector<float> &gaussSum = k1Map[stringKey];
+            if (gaussSum.empty()) {
+                gaussSum.resize(n, 0);
             }
+            this->gaussian(geom, weight, start, dx, sigmasqrt2, n, gaussSum);
         }
     }
     return k1Map;
@@ -74,7 +115,7 @@ map<string, vector<float>> MBTR::getK1(const vector<int> &Z, const string &geomF
 map<string, vector<float>> MBTR::getK2(const vector<int> &Z, const vector<vector<float>> &distances, const vector<vector<int>> &neighbours, const string &geomFunc, const string &weightFunc, const map<string, float> &parameters, float min, float max, float sigma, int n)
 {
     // Initialize some variables outside the loop
-    map<string, vector<float> > k2Map;
+    map<index2d, vector<float>> k2Map;
     int nAtoms = Z.size();
     float dx = (max-min)/(n-1);
     float sigmasqrt2 = sigma*sqrt(2.0);
@@ -131,14 +172,11 @@ map<string, vector<float>> MBTR::getK2(const vector<int> &Z, const vector<vector
                         weight /= 2;
                     }
 
-                    // Calculate gaussian
-                    vector<float> gauss = gaussian(geom, weight, start, dx, sigmasqrt2, n);
-
                     // Get the index of the present elements in the final vector
                     int i_elem = Z[i];
                     int j_elem = Z[j];
-                    int i_index = this->atomicNumberToIndexMap.at(i_elem);
-                    int j_index = this->atomicNumberToIndexMap.at(j_elem);
+                    int i_index = this->getElementIndex(i_elem);
+                    int j_index = this->getElementIndex(j_elem);
 
                     // Save information in the part where j_index >= i_index
                     if (j_index < i_index) {
@@ -147,32 +185,26 @@ map<string, vector<float>> MBTR::getK2(const vector<int> &Z, const vector<vector
                         i_index = temp;
                     }
 
-                    // Form the key as string to enable passing it through cython
-                    stringstream ss;
-                    ss << i_index;
-                    ss << ",";
-                    ss << j_index;
-                    string stringKey = ss.str();
-
-                    // Sum gaussian into output
-                    auto it = k2Map.find(stringKey);
-                    if ( it == k2Map.end() ) {
-                        k2Map[stringKey] = gauss;
-                    } else {
-                        vector<float> &old = it->second;
-                        transform(old.begin(), old.end(), gauss.begin(), old.begin(), plus<float>());
+                    // Form the key
+                    index2d key = make_tuple(i_index, j_index);
+
+                    // Sum the gaussian directly into the output
+                    vector<float> &gaussSum = k2Map[key];
+                    if (gaussSum.empty()) {
+                        gaussSum.resize(n, 0);
                     }
+                    this->gaussian(geom, weight, start, dx, sigmasqrt2, n, gaussSum);
                 }
             }
         }
     }
 
-    return k2Map;
+    return this->toStringKeys(k2Map);
 }
 
 map<string, vector<float> > MBTR::getK3(const vector<int> &Z, const vector<vector<float> > &distances, const vector<vector<int> > &neighbours, const string &geomFunc, const string &weightFunc, const map<string, float> &parameters, float min, float max, float sigma, int n)
 {
-    map<string, vector<float> > k3Map;
+    map<index3d, vector<float>> k3Map;
     int nAtoms = Z.size();
     float dx = (max-min)/(n-1);
     float sigmasqrt2 = sigma*sqrt(2.0);
@@ -242,16 +274,13 @@ map<string, vector<float> > MBTR::getK3(const vector<int> &Z, const vector<vecto
                                 weight /= diff_sum;
                             }
 
-                            // Calculate gaussian
-                            vector<float> gauss = gaussian(geom, weight, start, dx, sigmasqrt2, n);
-
                             // Get the index of the present elements in the final vector
                             int i_elem = Z[i];
                             int j_elem = Z[j];
                             int k_elem = Z[k];
-                            int i_index = this->atomicNumberToIndexMap.at(i_elem);
-                            int j_index = this->atomicNumberToIndexMap.at(j_elem);
-                            int k_index = this->atomicNumberToIndexMap.at(k_elem);
+                            int i_index = this->getElementIndex(i_elem);
+                            int j_index = this->getElementIndex(j_elem);
+                            int k_index = this->getElementIndex(k_elem);
 
                             // Save information in the part where k_index >= i_index
                             if (k_index < i_index) {
@@ -260,54 +289,59 @@ map<string, vector<float> > MBTR::getK3(const vector<int> &Z, const vector<vecto
                                 i_index = temp;
                             }
 
-                            // Form the key as string to enable passing it through cython
-                            stringstream ss;
-                            ss << i_index;
-                            ss << ",";
-                            ss << j_index;
-                            ss << ",";
-                            ss << k_index;
-                            string stringKey = ss.str();
-
-                            // Sum gaussian into output
-                            auto it = k3Map.find(stringKey);
-                            if ( it == k3Map.end() ) {
-                                k3Map[stringKey] = gauss;
-                            } else {
-                                vector<float> &old = it->second;
-                                transform(old.begin(), old.end(), gauss.begin(), old.begin(), plus<float>());
+                            // Form the key
+                            index3d key = make_tuple(i_index, j_index, k_index);
+
+                            // Sum the gaussian directly into the output
+                            vector<float> &gaussSum = k3Map[key];
+                            if (gaussSum.empty()) {
+                                gaussSum.resize(n, 0);
                             }
+                            this->gaussian(geom, weight, start, dx, sigmasqrt2, n, gaussSum);
                         }
                     }
                 }
             }
         }
     }
-    return k3Map;
+    return this->toStringKeys(k3Map);
 }
 
-inline vector<float> MBTR::gaussian(float center, float weight, float start, float dx, float sigmasqrt2, int n) {
-
-    // We first calculate the cumulative distibution function for a normal
-    // distribution.
-    vector<float> cdf(n+1);
-    float x = start;
-    for (auto &it : cdf) {
-        it = weight*1.0/2.0*(1.0 + erf((x-center)/sigmasqrt2));
-        x += dx;
-    }
+inline void MBTR::gaussian(float center, float weight, float start, float dx, float sigmasqrt2, int n, vector<float> &out) {
 
     // The normal distribution is calculated as a derivative of the cumulative
-    // distribution, as with coarse discretization this methods preserves the
-    // norm better.
-    vector<float> pdf(n);
-    int i = 0;
-    for (auto &it : pdf) {
-        it = (cdf[i+1]-cdf[i])/dx;
-        ++i;
+    // distibution function for a normal distribution, as with coarse
+    // discretization this methods preserves the norm better.
+    //
+    // Further than a few standard deviations away from the center the
+    // cumulative distribution is saturated to either zero or the full weight,
+    // so the derivative vanishes. The error function is thus only evaluated
+    // on the grid points that fall within this window.
+    float invSigmaSqrt2 = 1.0/sigmasqrt2;
+    float invDx = 1.0/dx;
+    float halfWidth = 6.0*sigmasqrt2;
+    float lower = floor((center-halfWidth-start)*invDx);
+    float upper = ceil((center+halfWidth-start)*invDx);
+    int iStart = lower < 0 ? 0 : (lower > n ? n : (int)lower);
+    int iEnd = upper < 0 ? 0 : (upper > n ? n : (int)upper);
+
+    if (iStart >= iEnd) {
+        return;
     }
 
-    return pdf;
+    // The cumulative distribution is evaluated on the fly, so only the value
+    // at the previous grid point is kept in memory. The constant part of the
+    // cumulative distribution cancels in the difference, and the remaining
+    // constant factors are combined into a single multiplier.
+    float prefactor = 0.5*weight*invDx;
+    float x = start + iStart*dx;
+    float erfPrev = erf((x-center)*invSigmaSqrt2);
+    for (int i = iStart; i < iEnd; ++i) {
+        x = start + (i+1)*dx;
+        float erfCurrent = erf((x-center)*invSigmaSqrt2);
+        out[i] += prefactor*(erfCurrent-erfPrev);
+        erfPrev = erfCurrent;
+    }
 }
 
 inline float MBTR::k1GeomAtomicNumber(const int &i, const vector<int> &Z)
@@ -400,7 +434,7 @@ vector<map<string, vector<float>>> MBTR::getK2Local(const vector<int> &indices,
     // We loop over the specified indices
     for (int i=0; i < nPos; ++i) {
         int iTrue = indices[i];
-        map<string, vector<float> > k2Map;
+        map<index2d, vector<float>> k2Map;
 
         // For each atom we loop only over the neighbours
         const vector<int> &i_neighbours = neighbours[i];
@@ -436,14 +470,11 @@ vector<map<string, vector<float>>> MBTR::getK2Local(const vector<int> &indices,
                 throw invalid_argument("Invalid weighting function.");
             }
 
-            // Calculate gaussian
-            vector<float> gauss = gaussian(geom, weight, start, dx, sigmasqrt2, n);
-
             // Get the index of the present elements in the final vector
             int i_elem = 0;
             int j_elem = Z[j];
-            int i_index = this->atomicNumberToIndexMap.at(i_elem);
-            int j_index = this->atomicNumberToIndexMap.at(j_elem);
+            int i_index = this->getElementIndex(i_elem);
+            int j_index = this->getElementIndex(j_elem);
 
             // Save information in the part where j_index >= i_index
             if (j_index < i_index) {
@@ -452,23 +483,17 @@ vector<map<string, vector<float>>> MBTR::getK2Local(const vector<int> &indices,
                 i_index = temp;
             }
 
-            // Form the key as string to enable passing it through cython
-            stringstream ss;
-            ss << i_index;
-            ss << ",";
-            ss << j_index;
-            string stringKey = ss.str();
-
-            // Sum gaussian into output
-            auto it = k2Map.find(stringKey);
-            if ( it == k2Map.end() ) {
-                k2Map[stringKey] = gauss;
-            } else {
-                vector<float> &old = it->second;
-                transform(old.begin(), old.end(), gauss.begin(), old.begin(), plus<float>());
+            // Form the key
+            index2d key = make_tuple(i_index, j_index);
+
+            // Sum the gaussian directly into the output
+            vector<float> &gaussSum = k2Map[key];
+            if (gaussSum.empty()) {
+                gaussSum.resize(n, 0);
             }
+            this->gaussian(geom, weight, start, dx, sigmasqrt2, n, gaussSum);
         }
-        k2Maps[i] = k2Map;
+        k2Maps[i] = this->toStringKeys(k2Map);
     }
 
     return k2Maps;
@@ -485,7 +510,7 @@ vector<map<string, vector<float>>> MBTR::getK3Local(const vector<int> &indices,
 
     // We loop over the specified indices
     for (const int &i : indices) {
-        map<string, vector<float> > k3Map;
+        map<index3d, vector<float>> k3Map;
 
         // For each atom we loop only over the atoms triplets that are
         // within the neighbourhood
@@ -522,16 +547,13 @@ vector<map<string, vector<float>>> MBTR::getK3Local(const vector<int> &indices,
                         throw invalid_argument("Invalid weighting function.");
                     }
 
-                    // Calculate gaussian
-                    vector<float> gauss = gaussian(geom, weight, start, dx, sigmasqrt2, n);
-
                     // Get the index of the present elements in the final vector
                     int i_elem = 0;
                     int j_elem = Z[j];
                     int k_elem = Z[k];
-                    int i_index = this->atomicNumberToIndexMap.at(i_elem);
-                    int j_index = this->atomicNumberToIndexMap.at(j_elem);
-                    int k_index = this->atomicNumberToIndexMap.at(k_elem);
+                    int i_index = this->getElementIndex(i_elem);
+                    int j_index = this->getElementIndex(j_elem);
+                    int k_index = this->getElementIndex(k_elem);
 
                     // Save information in the part where k_index >= i_index
                     if (k_index < i_index) {
@@ -540,23 +562,15 @@ vector<map<string, vector<float>>> MBTR::getK3Local(const vector<int> &indices,
                         i_index = temp;
                     }
 
-                    // Form the key as string to enable passing it through cython
-                    stringstream ss;
-                    ss << i_index;
-                    ss << ",";
-                    ss << j_index;
-                    ss << ",";
-                    ss << k_index;
-                    string stringKey = ss.str();
-
-                    // Sum gaussian into output
-                    auto it = k3Map.find(stringKey);
-                    if ( it == k3Map.end() ) {
-                        k3Map[stringKey] = gauss;
-                    } else {
-                        vector<float> &old = it->second;
-                        transform(old.begin(), old.end(), gauss.begin(), old.begin(), plus<float>());
+                    // Form the key
+                    index3d key = make_tuple(i_index, j_index, k_index);
+
+                    // Sum the gaussian directly into the output
+                    vector<float> &gaussSum = k3Map[key];
+                    if (gaussSum.empty()) {
+                        gaussSum.resize(n, 0);
                     }
+                    this->gaussian(geom, weight, start, dx, sigmasqrt2, n, gaussSum);
 
                     // Also include the angle where the local center is in
                     // the middle. Include it only once.
@@ -586,16 +600,13 @@ vector<map<string, vector<float>>> MBTR::getK3Local(const vector<int> &indices,
                             throw invalid_argument("Invalid weighting function.");
                         }
 
-                        // Calculate gaussian
-                        vector<float> gauss = gaussian(geom, weight, start, dx, sigmasqrt2, n);
-
                         // Get the index of the present elements in the final vector
                         int i_elem = 0;
                         int j_elem = Z[j];
                         int k_elem = Z[k];
-                        int i_index = this->atomicNumberToIndexMap.at(i_elem);
-                        int j_index = this->atomicNumberToIndexMap.at(j_elem);
-                        int k_index = this->atomicNumberToIndexMap.at(k_elem);
+                        int i_index = this->getElementIndex(i_elem);
+                        int j_index = this->getElementIndex(j_elem);
+                        int k_index = this->getElementIndex(k_elem);
 
                         // Save information in the part where k_index >= j_index
                         if (k_index < j_index) {
@@ -604,28 +615,20 @@ vector<map<string, vector<float>>> MBTR::getK3Local(const vector<int> &indices,
                             j_index = temp;
                         }
 
-                        // Form the key as string to enable passing it through cython
-                        stringstream ss;
-                        ss << j_index;
-                        ss << ",";
-                        ss << i_index;
-                        ss << ",";
-                        ss << k_index;
-                        string stringKey = ss.str();
-
-                        // Sum gaussian into output
-                        auto it = k3Map.find(stringKey);
-                        if ( it == k3Map.end() ) {
-                            k3Map[stringKey] = gauss;
-                        } else {
-                            vector<float> &old = it->second;
-                            transform(old.begin(), old.end(), gauss.begin(), old.begin(), plus<float>());
+                        // Form the key
+                        index3d key = make_tuple(j_index, i_index, k_index);
+
+                        // Sum the gaussian directly into the output
+                        vector<float> &gaussSum = k3Map[key];
+                        if (gaussSum.empty()) {
+                            gaussSum.resize(n, 0);
                         }
+                        this->gaussian(geom, weight, start, dx, sigmasqrt2, n, gaussSum);
                     }
                 }
             }
         }
-        k3Maps[iLoc] = k3Map;
+        k3Maps[iLoc] = this->toStringKeys(k3Map);
         ++iLoc;
     }
     return k3Maps;
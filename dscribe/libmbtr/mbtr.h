@@ -34,11 +34,22 @@ class MBTR {
         map<string, vector<float>> getK3(const vector<int> &Z, const vector<vector<float>> &distances, const vector<vector<int>> &neighbours, const string &geomFunc, const string &weightFunc, const map<string, float> &parameters, float min, float max, float sigma, int n);
         vector<map<string, vector<float>>> getK2Local(const vector<int> &indices, const vector<int> &Z, const vector<vector<float>> &distances, const vector<vector<int>> &neighbours, const string &geomFunc, const string &weightFunc, const map<string, float> &parameters, float min, float max, float sigma, int n);
         vector<map<string, vector<float>>> getK3Local(const vector<int> &indices, const vector<int> &Z, const vector<vector<float>> &distances, const vector<vector<int>> &neighbours, const string &geomFunc, const string &weightFunc, const map<string, float> &parameters, float min, float max, float sigma, int n);
-        vector<float> gaussian(float center, float weight, float start, float dx, float sigmasqrt2, int n);
+        /**
+         * Adds a discretized gaussian to the given output vector.
+         *
+         * @param center Center of the gaussian.
+         * @param weight Weight of the gaussian.
+         * @param start Start of the discretization grid.
+         * @param dx Spacing of the discretization grid.
+         * @param sigmasqrt2 Standard deviation of the gaussian multiplied by sqrt(2).
+         * @param n Number of grid points.
+         * @param out Vector of length n into which the gaussian is summed.
+         */
+        void gaussian(float center, float weight, float start, float dx, float sigmasqrt2, int n, vector<float> &out);
 
 
     private:
-        const map<int,int> atomicNumberToIndexMap;
+        vector<int> atomicNumberToIndexTable;
         const int interactionLimit;
         const vector<vector<int> > cellIndices;
 
@@ -52,6 +63,27 @@ class MBTR {
          */
         float k1GeomAtomicNumber(const int &i, const vector<int> &Z);
 
+        /**
+         * Returns the position of the given element in the final MBTR vector.
+         *
+         * @param atomicNumber Atomic number of the element.
+         *
+         * @return Index of the element.
+         */
+        int getElementIndex(const int &atomicNumber);
+
+        /**
+         * Converts the element index keys of the given map into the
+         * comma-separated string keys that are passed through cython. The
+         * values are moved out of the given map.
+         *
+         * @param indexMap Map from element indices to spectra.
+         *
+         * @return Map from string keys to spectra.
+         */
+        map<string, vector<float>> toStringKeys(map<index2d, vector<float>> &indexMap);
+        map<string, vector<float>> toStringKeys(map<index3d, vector<float>> &indexMap);
+
         /**
          * Weighting of 1. Usually used for finite small
          * systems.
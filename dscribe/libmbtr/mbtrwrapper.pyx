@@ -5,8 +5,67 @@ from libcpp cimport bool
 from libcpp.vector cimport vector
 from libcpp.map cimport map
 from libcpp.string cimport string
+from libc.string cimport memcpy
+from cython.operator cimport dereference as deref, preincrement as inc
 from mbtr cimport MBTR
 
+
+cdef fill_arrays(map[string, vector[float]] &cmap, keys, float[:, ::1] values, size_t offset):
+    """Copies the contents of a C++ map of string keys and gaussian sums into
+    contiguous arrays, starting from the given row. Each key is written as a
+    row of integer indices, and the corresponding gaussian sum is copied
+    directly into the same row of the values, so that it is never boxed into
+    an intermediate python list.
+    """
+    cdef map[string, vector[float]].iterator it = cmap.begin()
+    cdef size_t n = values.shape[1]
+    cdef size_t i_row = offset
+
+    while it != cmap.end():
+        keys[i_row] = [int(x) for x in deref(it).first.decode("utf-8").split(",")]
+        if n != 0:
+            memcpy(&values[i_row, 0], deref(it).second.data(), n*sizeof(float))
+        i_row += 1
+        inc(it)
+
+
+cdef tuple to_arrays(map[string, vector[float]] &cmap, int degree, int n):
+    """Converts a C++ map of string keys and gaussian sums into two
+    contiguous arrays: the keys as an integer array of shape (n_keys, degree)
+    and the gaussian sums in the same order as a float32 array of shape
+    (n_keys, n).
+    """
+    keys = np.empty((cmap.size(), degree), dtype=int)
+    values = np.empty((cmap.size(), n), dtype=np.float32)
+    fill_arrays(cmap, keys, values, 0)
+
+    return keys, values
+
+
+cdef tuple to_arrays_local(vector[map[string, vector[float]]] &cmaps, int degree, int n):
+    """Converts the C++ maps of multiple local centers into contiguous
+    arrays. The keys and gaussian sums of all the centers are stacked one
+    center after another, and the index of the local center is stored for
+    each row.
+    """
+    cdef size_t i
+    cdef size_t n_rows = 0
+    sizes = np.empty(cmaps.size(), dtype=int)
+    for i in range(cmaps.size()):
+        sizes[i] = cmaps[i].size()
+        n_rows += cmaps[i].size()
+
+    keys = np.empty((n_rows, degree), dtype=int)
+    values = np.empty((n_rows, n), dtype=np.float32)
+    cdef size_t offset = 0
+    for i in range(cmaps.size()):
+        fill_arrays(cmaps[i], keys, values, offset)
+        offset += cmaps[i].size()
+    loc_ids = np.repeat(np.arange(cmaps.size()), sizes)
+
+    return loc_ids, keys, values
+
+
 cdef class MBTRWrapper:
     cdef MBTR *thisptr      # hold a C++ instance which we're wrapping
 
@@ -16,78 +75,59 @@ cdef class MBTRWrapper:
     def __dealloc__(self):
         del self.thisptr
 
-    def get_k1(self, Z, geom_func, weight_func, parameters, start, stop, sigma, n):
-        """Cython cannot directly provide the keys as tuples, so we have to do
-        the conversion here on the python side.
+    def get_k1(self, vector[int] Z, string geom_func, string weight_func, map[string, float] parameters, float start, float stop, float sigma, int n):
+        """Cython cannot directly provide the keys as tuples, so the keys are
+        converted here into an integer array. The keys and gaussian sums are
+        returned as two contiguous arrays with one row per key.
         """
-        k1_map = self.thisptr.getK1(Z, geom_func, weight_func, parameters, start, stop, sigma, n)
-        k1_map = dict(k1_map)
-        new_k1_map = {}
+        cdef map[string, vector[float]] k1_map
+        with nogil:
+            k1_map = self.thisptr.getK1(Z, geom_func, weight_func, parameters, start, stop, sigma, n)
 
-        for key, value in k1_map.items():
-            new_key = tuple([int(key.decode("utf-8"))])
-            new_k1_map[new_key] = np.array(value, dtype=np.float32)
+        return to_arrays(k1_map, 1, n)
 
-        return new_k1_map
-
-    def get_k2(self, Z, distances, neighbours, geom_func, weight_func, parameters, start, stop, sigma, n):
-        """Cython cannot directly provide the keys as tuples, so we have to do
-        the conversion here on the python side.
+    def get_k2(self, vector[int] Z, vector[vector[float]] distances, vector[vector[int]] neighbours, string geom_func, string weight_func, map[string, float] parameters, float start, float stop, float sigma, int n):
+        """Cython cannot directly provide the keys as tuples, so the keys are
+        converted here into an integer array. The keys and gaussian sums are
+        returned as two contiguous arrays with one row per key.
         """
-        k2_map = self.thisptr.getK2(Z, distances, neighbours, geom_func, weight_func, parameters, start, stop, sigma, n)
-        k2_map = dict(k2_map)
-        new_k2_map = {}
-
-        for key, value in k2_map.items():
-            new_key = tuple(int(x) for x in key.decode("utf-8").split(","))
-            new_k2_map[new_key] = np.array(value, dtype=np.float32)
+        cdef map[string, vector[float]] k2_map
+        with nogil:
+            k2_map = self.thisptr.getK2(Z, distances, neighbours, geom_func, weight_func, parameters, start, stop, sigma, n)
 
-        return new_k2_map
+        return to_arrays(k2_map, 2, n)
 
-    def get_k3(self, Z, distances, neighbours, geom_func, weight_func, parameters, start, stop, sigma, n):
-        """Cython cannot directly provide the keys as tuples, so we have to do
-        the conversion here on the python side.
+    def get_k3(self, vector[int] Z, vector[vector[float]] distances, vector[vector[int]] neighbours, string geom_func, string weight_func, map[string, float] parameters, float start, float stop, float sigma, int n):
+        """Cython cannot directly provide the keys as tuples, so the keys are
+        converted here into an integer array. The keys and gaussian sums are
+        returned as two contiguous arrays with one row per key.
         """
-        k3_map = self.thisptr.getK3(Z, distances, neighbours, geom_func, weight_func, parameters, start, stop, sigma, n)
-        k3_map = dict(k3_map)
-        new_k3_map = {}
+        cdef map[string, vector[float]] k3_map
+        with nogil:
+            k3_map = self.thisptr.getK3(Z, distances, neighbours, geom_func, weight_func, parameters, start, stop, sigma, n)
 
-        for key, value in k3_map.items():
-            new_key = tuple(int(x) for x in key.decode("utf-8").split(","))
-            new_k3_map[new_key] = np.array(value, dtype=np.float32)
+        return to_arrays(k3_map, 3, n)
 
-        return new_k3_map
-
-    def get_k2_local(self, indices, Z, distances, neighbours, geom_func, weight_func, parameters, start, stop, sigma, n):
-        """Cython cannot directly provide the keys as tuples, so we have to do
-        the conversion here on the python side.
+    def get_k2_local(self, vector[int] indices, vector[int] Z, vector[vector[float]] distances, vector[vector[int]] neighbours, string geom_func, string weight_func, map[string, float] parameters, float start, float stop, float sigma, int n):
+        """Cython cannot directly provide the keys as tuples, so the keys are
+        converted here into an integer array. The keys and gaussian sums of
+        all the local centers are returned as contiguous arrays with one row
+        per key, together with the index of the local center of each row.
         """
-        k2_list = self.thisptr.getK2Local(indices, Z, distances, neighbours, geom_func, weight_func, parameters, start, stop, sigma, n)
-        new_k2_list = []
-
-        for item in k2_list:
-            new_k2_map = {}
-            item = dict(item)
-            for key, value in item.items():
-                new_key = tuple(int(x) for x in key.decode("utf-8").split(","))
-                new_k2_map[new_key] = np.array(value, dtype=np.float32)
-            new_k2_list.append(new_k2_map)
-
-        return new_k2_list
-
-    def get_k3_local(self, indices, Z, distances, neighbours, geom_func, weight_func, parameters, start, stop, sigma, n):
-        """Cython cannot directly provide the keys as tuples, so we have to do
-        the conversion here on the python side.
+        cdef vector[map[string, vector[float]]] k2_list
+        with nogil:
+            k2_list = self.thisptr.getK2Local(indices, Z, distances, neighbours, geom_func, weight_func, parameters, start, stop, sigma, n)
+
+        return to_arrays_local(k2_list, 2, n)
+
+    def get_k3_local(self, vector[int] indices, vector[int] Z, vector[vector[float]] distances, vector[vector[int]] neighbours, string geom_func, string weight_func, map[string, float] parameters, float start, float stop, float sigma, int n):
+        """Cython cannot directly provide the keys as tuples, so the keys are
+        converted here into an integer array. The keys and gaussian sums of
+        all the local centers are returned as contiguous arrays with one row
+        per key, together with the index of the local center of each row.
         """
-        k3_list = self.thisptr.getK3Local(indices, Z, distances, neighbours, geom_func, weight_func, parameters, start, stop, sigma, n)
-        new_k3_list = []
-
-        for item in k3_list:
-            new_k3_map = {}
-            item = dict(item)
-            for key, value in item.items():
-                new_key = tuple(int(x) for x in key.decode("utf-8").split(","))
-                new_k3_map[new_key] = np.array(value, dtype=np.float32)
-            new_k3_list.append(new_k3_map)
-
-        return new_k3_list
+        cdef vector[map[string, vector[float]]] k3_list
+        with nogil:
+            k3_list = self.thisptr.getK3Local(indices, Z, distances, neighbours, geom_func, weight_func, parameters, start, stop, sigma, n)
+
+        return to_arrays_local(k3_list, 3, n)
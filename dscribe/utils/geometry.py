@@ -16,7 +16,7 @@ limitations under the License.
 import numpy as np
 
 import scipy.sparse
-from scipy.spatial.distance import cdist
+import scipy.spatial
 
 from ase import Atoms
 
@@ -48,16 +48,19 @@ def get_adjacency_matrix(radius, pos1, pos2=None, output_type="coo_matrix"):
         balanced_tree=True,
         boxsize=None
     )
+    # If the distances are calculated within a single set of positions, the
+    # same tree is used for both sides.
     if pos2 is None:
-        pos2 = pos1
-    tree2 = scipy.spatial.cKDTree(
-        pos2,
-        leafsize=16,
-        compact_nodes=True,
-        copy_data=False,
-        balanced_tree=True,
-        boxsize=None
-    )
+        tree2 = tree1
+    else:
+        tree2 = scipy.spatial.cKDTree(
+            pos2,
+            leafsize=16,
+            compact_nodes=True,
+            copy_data=False,
+            balanced_tree=True,
+            boxsize=None
+        )
     dmat = tree1.sparse_distance_matrix(tree2, radius, output_type=output_type)
 
     return dmat
@@ -117,15 +120,12 @@ def get_extended_system(system, radial_cutoff, centers=None, return_cell_indices
     # Notice that we need to use vectors that are perpendicular to the cell
     # vectors to ensure that the correct atoms are included for non-cubic cells.
     cell = np.array(system.get_cell())
-    a1, a2, a3 = cell[0], cell[1], cell[2]
-    b1 = np.cross(a2, a3, axis=0)
-    b2 = np.cross(a3, a1, axis=0)
-    b3 = np.cross(a1, a2, axis=0)
-    p1 = np.dot(a1, b1) / np.dot(b1, b1) * b1  # Projections onto perpendicular vectors
-    p2 = np.dot(a2, b2) / np.dot(b2, b2) * b2
-    p3 = np.dot(a3, b3) / np.dot(b3, b3) * b3
-    xyz_arr = np.linalg.norm(np.array([p1, p2, p3]), axis=1)
-    cell_images = np.ceil(radial_cutoff/xyz_arr)
+    normals = np.cross(cell[[1, 2, 0]], cell[[2, 0, 1]])
+
+    # The distance between opposite faces of the cell is given in closed form
+    # by the projection of each cell vector onto the face normal: |a.b|/|b|.
+    heights = np.abs(np.einsum("ij,ij->i", cell, normals))/np.linalg.norm(normals, axis=1)
+    cell_images = np.ceil(radial_cutoff/heights)
     nx = int(cell_images[0])
     ny = int(cell_images[1])
     nz = int(cell_images[2])
@@ -135,18 +135,16 @@ def get_extended_system(system, radial_cutoff, centers=None, return_cell_indices
     # return the multiplied system. This is much faster.
     if centers is None and not return_cell_indices:
 
-        n_atoms = len(system)
         n_rep = np.product(2*n_copies_axis+1)  # Number of repeated copies
-        ext_pos = np.tile(system.get_positions(), (n_rep, 1))
 
         # Calculate the extended system positions so that the original cell
-        # stays in place: both in space and in index
-        i_curr = 0
-        for m0 in np.append(np.arange(0, nx+1), np.arange(-nx, 0)):
-            for m1 in np.append(np.arange(0, ny+1), np.arange(-ny, 0)):
-                for m2 in np.append(np.arange(0, nz+1), np.arange(-nz, 0)):
-                    ext_pos[i_curr:i_curr+n_atoms] += np.dot((m0, m1, m2), cell)
-                    i_curr += n_atoms
+        # stays in place: both in space and in index. The translations for all
+        # copies are calculated with one matrix product and broadcast over the
+        # atoms.
+        ranges = [np.append(np.arange(0, n+1), np.arange(-n, 0)) for n in n_copies_axis]
+        offsets = np.stack(np.meshgrid(*ranges, indexing="ij"), axis=-1).reshape(-1, 3)
+        shifts = np.dot(offsets, cell)
+        ext_pos = (system.get_positions()[None, :, :] + shifts[:, None, :]).reshape(-1, 3)
 
         ext_symbols = np.tile(system.get_atomic_numbers(), n_rep)
         extended_system = Atoms(
@@ -156,9 +154,9 @@ def get_extended_system(system, radial_cutoff, centers=None, return_cell_indices
 
         return extended_system
 
-    # If centers are given and/or cell indices are needed, the process is done
-    # one cell at a time to keep track of the cell inded and the distances.
-    # This is a bit slower.
+    # If centers are given and/or cell indices are needed, the cell index of
+    # each copy is tracked and the copies are filtered by their distance to
+    # the centers. This is a bit slower.
     else:
         # We need to specify that the relative positions should not be wrapped.
         # Otherwise the repeated systems may overlap with the positions taken
@@ -167,53 +165,44 @@ def get_extended_system(system, radial_cutoff, centers=None, return_cell_indices
         numbers = np.array(system.numbers)
         cartesian_pos = np.array(system.get_positions())
 
-        # Create copies of the cell but keep track of the atoms in the
-        # original cell
-        num_extended = []
-        pos_extended = []
-        num_extended.append(numbers)
-        pos_extended.append(cartesian_pos)
-        a = np.array([1, 0, 0])
-        b = np.array([0, 1, 0])
-        c = np.array([0, 0, 1])
-        cell_indices = [np.zeros((len(system), 3), dtype=int)]
-
-        for i in range(-n_copies_axis[0], n_copies_axis[0]+1):
-            for j in range(-n_copies_axis[1], n_copies_axis[1]+1):
-                for k in range(-n_copies_axis[2], n_copies_axis[2]+1):
-                    if i == 0 and j == 0 and k == 0:
-                        continue
-
-                    # Calculate the positions of the copied atoms and filter
-                    # out the atoms that are farther away than the given
-                    # cutoff.
-                    num_copy = np.array(numbers)
-                    pos_copy = np.array(relative_pos)
-
-                    pos_shifted = pos_copy-i*a-j*b-k*c
-                    pos_copy_cartesian = np.dot(pos_shifted, cell)
-
-                    # Only distances to the atoms within the interaction limit
-                    # are considered.
-                    distances = cdist(pos_copy_cartesian, centers)
-                    weight_mask = distances < radial_cutoff
-
-                    # Create a boolean mask that says if the atom is within the
-                    # range from at least one atom in the original cell
-                    valids_mask = np.any(weight_mask, axis=1)
-
-                    if np.any(valids_mask):
-                        valid_pos = pos_copy_cartesian[valids_mask]
-                        valid_num = num_copy[valids_mask]
-                        valid_ind = np.tile(np.array([i, j, k], dtype=int), (len(valid_num), 1))
-
-                        pos_extended.append(valid_pos)
-                        num_extended.append(valid_num)
-                        cell_indices.append(valid_ind)
-
-        pos_extended = np.concatenate(pos_extended)
-        num_extended = np.concatenate(num_extended)
-        cell_indices = np.vstack(cell_indices)
+        # Form the indices of all the cell copies at once. The original cell
+        # at [0, 0, 0] is left out, as it is always included as such.
+        ranges = [np.arange(-n, n+1) for n in n_copies_axis]
+        offsets = np.stack(np.meshgrid(*ranges, indexing="ij"), axis=-1).reshape(-1, 3)
+        offsets = offsets[np.any(offsets != 0, axis=1)]
+        n_offsets = len(offsets)
+
+        # Calculate the positions of all the copied atoms with a single matrix
+        # product. The copies are laid out one cell after another.
+        pos_shifted = relative_pos[None, :, :] - offsets[:, None, :]
+        pos_copy_cartesian = np.dot(pos_shifted.reshape(-1, 3), cell)
+        num_copy = np.tile(numbers, n_offsets)
+        ind_copy = np.repeat(offsets, len(numbers), axis=0)
+
+        # Only distances to the atoms within the interaction limit are
+        # considered. Create a boolean mask that says if the atom is within
+        # the range from at least one of the centers. This is equivalent to
+        # the nearest center being within range, which is found with a k-d
+        # tree search that is pruned at the cutoff. This way the full distance
+        # matrix between the copies and the centers is never formed.
+        tree = scipy.spatial.cKDTree(centers)
+        nearest, _ = tree.query(pos_copy_cartesian, k=1, distance_upper_bound=radial_cutoff)
+        valids_mask = nearest < radial_cutoff
+
+        # Add the valid copies after the atoms in the original cell. The
+        # output arrays are allocated once and the valid copies are written
+        # directly into them.
+        n_orig = len(system)
+        n_total = n_orig + np.count_nonzero(valids_mask)
+        pos_extended = np.empty((n_total, 3), dtype=pos_copy_cartesian.dtype)
+        num_extended = np.empty(n_total, dtype=numbers.dtype)
+        cell_indices = np.empty((n_total, 3), dtype=int)
+        pos_extended[:n_orig] = cartesian_pos
+        num_extended[:n_orig] = numbers
+        cell_indices[:n_orig] = 0
+        np.compress(valids_mask, pos_copy_cartesian, axis=0, out=pos_extended[n_orig:])
+        np.compress(valids_mask, num_copy, axis=0, out=num_extended[n_orig:])
+        np.compress(valids_mask, ind_copy, axis=0, out=cell_indices[n_orig:])
 
         extended_system = Atoms(
             positions=pos_extended,
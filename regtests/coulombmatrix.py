@@ -104,6 +104,42 @@ class CoulombMatrixTests(TestBaseClass, unittest.TestCase):
         vec = desc.create(H2O)
         self.assertTrue(type(vec) == scipy.sparse.coo_matrix)
 
+    def test_dtype(self):
+        """Tests that the matrix is created with the requested data type.
+        """
+        # By default a single system is returned in double precision and
+        # multiple systems in single precision
+        desc = CoulombMatrix(n_atoms_max=5, permutation="sorted_l2", flatten=False)
+        reference = desc.create(H2O)
+        self.assertEqual(reference.dtype, np.float64)
+        desc.flatten = True
+        vec = desc.create([H2O, H2O])
+        self.assertEqual(vec.dtype, np.float32)
+        desc.flatten = False
+
+        desc = CoulombMatrix(n_atoms_max=5, permutation="sorted_l2", flatten=False, dtype="float32")
+        cm = desc.create(H2O)
+        self.assertEqual(cm.dtype, np.float32)
+        self.assertTrue(np.allclose(cm, reference, rtol=1e-6))
+
+        # Multiple systems
+        for dtype in ["float32", "float64"]:
+            desc = CoulombMatrix(n_atoms_max=5, permutation="none", flatten=True, dtype=dtype)
+            vec = desc.create([H2O, H2O], n_jobs=2)
+            self.assertEqual(vec.dtype, np.dtype(dtype))
+            desc.sparse = True
+            vec = desc.create([H2O, H2O], n_jobs=2)
+            self.assertEqual(vec.dtype, np.dtype(dtype))
+
+        # Invalid data type
+        with self.assertRaises(ValueError):
+            CoulombMatrix(n_atoms_max=5, dtype="int32")
+        with self.assertRaises(ValueError):
+            desc = CoulombMatrix(n_atoms_max=5)
+            desc.dtype = "int8"
+        with self.assertRaises(ValueError):
+            CoulombMatrix(n_atoms_max=5, dtype="float16")
+
     def test_parallel_dense(self):
         """Tests creating dense output parallelly.
         """
@@ -142,6 +178,36 @@ class CoulombMatrixTests(TestBaseClass, unittest.TestCase):
         assumed[1] = desc.create(samples[1])
         self.assertTrue(np.allclose(np.array(output), assumed))
 
+    def test_batch(self):
+        """Tests that the matrices created for multiple systems at once are
+        the same as the ones created for each system separately.
+        """
+        samples = [molecule("CO"), molecule("N2O"), molecule("CH3OH")]
+        for permutation in ["none", "sorted_l2"]:
+            desc = CoulombMatrix(n_atoms_max=6, permutation=permutation, flatten=True)
+            assumed = np.vstack([desc.create(sample) for sample in samples])
+            for batch_size in [1, 2, 256]:
+                output = desc.create_batch(samples, batch_size=batch_size)
+                self.assertEqual(output.shape, assumed.shape)
+                self.assertEqual(output.dtype, desc.create(samples).dtype)
+                self.assertTrue(np.allclose(output, assumed))
+
+        # Sparse output
+        desc = CoulombMatrix(n_atoms_max=6, permutation="sorted_l2", sparse=True)
+        output = desc.create_batch(samples, batch_size=2)
+        self.assertTrue(type(output) == scipy.sparse.csr_matrix)
+        self.assertTrue(np.allclose(output.toarray(), desc.create(samples).toarray()))
+
+        # Unsupported permutation
+        desc = CoulombMatrix(n_atoms_max=6, permutation="eigenspectrum")
+        with self.assertRaises(ValueError):
+            desc.create_batch(samples)
+
+        # Too many atoms
+        desc = CoulombMatrix(n_atoms_max=2)
+        with self.assertRaises(ValueError):
+            desc.create_batch(samples)
+
     def test_parallel_sparse(self):
         """Tests creating sparse output parallelly.
         """
@@ -6,9 +6,12 @@ import unittest
 from dscribe.core import System
 from dscribe.descriptors import ACSF
 from dscribe.utils.species import symbols_to_numbers
+from dscribe.utils.geometry import get_adjacency_matrix, get_extended_system
 
 from ase.lattice.cubic import SimpleCubicFactory
+from ase import Atoms
 import ase.data
+from scipy.spatial.distance import cdist
 
 
 class GeometryTests(unittest.TestCase):
@@ -75,6 +78,100 @@ class GeometryTests(unittest.TestCase):
         expected = np.linalg.norm(positions[0, :] - positions[1, :])
         self.assertTrue(np.allclose(distance, expected))
 
+    def test_adjacency_matrix(self):
+        """Tests that the adjacency matrix within a single set of positions is
+        the same as when the same positions are given explicitly for both
+        sides.
+        """
+        pos = np.random.RandomState(42).uniform(0, 5, size=(30, 3))
+        dmat = get_adjacency_matrix(2.0, pos)
+        assumed = get_adjacency_matrix(2.0, pos, pos)
+        self.assertTrue(dmat.nnz > len(pos))
+        self.assertTrue(np.array_equal(dmat.toarray(), assumed.toarray()))
+
+        dmat = get_adjacency_matrix(2.0, pos, output_type="dict")
+        assumed = get_adjacency_matrix(2.0, pos, pos, output_type="dict")
+        self.assertEqual(dmat, assumed)
+
+    def test_extended_system(self):
+        """Tests that the extended system contains exactly the periodic copies
+        that are within the cutoff from the centers.
+        """
+        def brute_force(system, cutoff, centers):
+            """The copies in the same order as in the original cell loop,
+            using more cells than needed.
+            """
+            cell = np.array(system.get_cell())
+            relative_pos = system.get_scaled_positions(wrap=False)
+            numbers = system.get_atomic_numbers()
+            volume = abs(np.linalg.det(cell))
+            heights = volume/np.linalg.norm(np.cross(cell[[1, 2, 0]], cell[[2, 0, 1]]), axis=1)
+            n = np.ceil(cutoff/heights).astype(int) + 1
+            pos = [system.get_positions()]
+            num = [numbers]
+            ind = [np.zeros((len(system), 3), dtype=int)]
+            for i in range(-n[0], n[0]+1):
+                for j in range(-n[1], n[1]+1):
+                    for k in range(-n[2], n[2]+1):
+                        if i == 0 and j == 0 and k == 0:
+                            continue
+                        pos_copy = np.dot(relative_pos - [i, j, k], cell)
+                        mask = np.any(cdist(pos_copy, centers) < cutoff, axis=1)
+                        pos.append(pos_copy[mask])
+                        num.append(numbers[mask])
+                        ind.append(np.tile([i, j, k], (np.count_nonzero(mask), 1)))
+            return np.concatenate(pos), np.concatenate(num), np.vstack(ind)
+
+        # Skewed cell with the atoms as centers
+        system = Atoms(
+            cell=[
+                [4.0, 0.0, 0.0],
+                [2.0, 3.5, 0.0],
+                [1.0, 1.0, 3.0],
+            ],
+            scaled_positions=[
+                [0.0, 0.0, 0.0],
+                [0.5, 0.25, 0.1],
+                [0.9, 0.7, 0.6],
+            ],
+            symbols=["H", "O", "C"],
+            pbc=True,
+        )
+        cutoff = 5.0
+        centers = system.get_positions()
+        ext_system, cell_indices = get_extended_system(system, cutoff, centers, return_cell_indices=True)
+        pos, num, ind = brute_force(system, cutoff, centers)
+        self.assertTrue(len(ext_system) > len(system))
+        self.assertTrue(np.allclose(ext_system.get_positions(), pos))
+        self.assertTrue(np.array_equal(ext_system.get_atomic_numbers(), num))
+        self.assertTrue(np.array_equal(cell_indices, ind))
+
+        # The atoms of the original cell come first
+        self.assertTrue(np.array_equal(ext_system.get_positions()[:len(system)], system.get_positions()))
+        self.assertTrue(np.array_equal(cell_indices[:len(system)], np.zeros((len(system), 3))))
+
+        # Without centers the whole copied cells are returned
+        ext_system = get_extended_system(system, cutoff)
+        self.assertEqual(len(ext_system) % len(system), 0)
+        self.assertTrue(np.array_equal(ext_system.get_positions()[:len(system)], system.get_positions()))
+        self.assertTrue(set(map(tuple, np.round(pos, 8))).issubset(set(map(tuple, np.round(ext_system.get_positions(), 8)))))
+
+        # Copies exactly at the cutoff are not included
+        system = Atoms(
+            cell=np.eye(3)*4.0,
+            scaled_positions=[[0.0, 0.0, 0.0]],
+            symbols=["H"],
+            pbc=True,
+        )
+        centers = system.get_positions()
+        for cutoff, n_copies in [(4.0, 0), (4.0 + 1e-6, 6)]:
+            ext_system, cell_indices = get_extended_system(system, cutoff, centers, return_cell_indices=True)
+            pos, num, ind = brute_force(system, cutoff, centers)
+            self.assertEqual(len(ext_system), 1 + n_copies)
+            self.assertTrue(np.allclose(ext_system.get_positions(), pos))
+            self.assertTrue(np.array_equal(ext_system.get_atomic_numbers(), num))
+            self.assertTrue(np.array_equal(cell_indices, ind))
+
     def test_transformations(self):
         """Test that coordinates are correctly transformed from scaled to
         cartesian and back again.
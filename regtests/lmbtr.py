@@ -331,8 +331,8 @@ class LMBTRTests(TestBaseClass, unittest.TestCase):
         # K2 unflattened
         desc = copy.deepcopy(default_desc_k2)
         desc.flatten = False
-        feat = desc.create(system, positions=[0])[0]["k2"]
-        self.assertEqual(feat.shape, (n_elem, nk2))
+        feat_tensor = desc.create(system, positions=[0])[0]["k2"]
+        self.assertEqual(feat_tensor.shape, (n_elem, nk2))
 
         # K2 flattened. The sparse matrix only supports 2D matrices, so the first
         # dimension is always present, even if it is of length 1.
@@ -341,6 +341,9 @@ class LMBTRTests(TestBaseClass, unittest.TestCase):
         feat = desc.create(system, positions=[0])
         self.assertEqual(feat.shape, (1, n_elem*nk2))
 
+        # The flattened output contains the same spectra in the same order
+        self.assertTrue(np.array_equal(feat_tensor.ravel(), feat[0]))
+
     def test_sparse(self):
         """Tests the sparse matrix creation.
         """
@@ -356,6 +359,41 @@ class LMBTRTests(TestBaseClass, unittest.TestCase):
         vec = desc.create(H2O, positions=[0])
         self.assertTrue(type(vec) == scipy.sparse.coo_matrix)
 
+    def test_dtype(self):
+        """Tests that the output is created with the requested data type.
+        """
+        reference = default_desc_k2_k3.create(H2O, positions=[0])
+        for dtype in ["float16", "float32", "float64"]:
+            # Dense
+            desc = copy.deepcopy(default_desc_k2_k3)
+            desc.dtype = dtype
+            vec = desc.create(H2O, positions=[0])
+            self.assertEqual(vec.dtype, np.dtype(dtype))
+            self.assertTrue(np.allclose(vec, reference, rtol=1e-2, atol=1e-2))
+
+            # Multiple systems
+            vec = desc.create([H2O, H2O], positions=[[0], [0]], n_jobs=2)
+            self.assertEqual(vec.dtype, np.dtype(dtype))
+
+            # Sparse, not supported by scipy in half precision
+            if dtype != "float16":
+                desc.sparse = True
+                vec = desc.create(H2O, positions=[0])
+                self.assertEqual(vec.dtype, np.dtype(dtype))
+                desc.sparse = False
+
+            # Non-flattened output
+            desc.flatten = False
+            tensors = desc.create(H2O, positions=[0])[0]
+            for tensor in tensors.values():
+                self.assertEqual(tensor.dtype, np.dtype(dtype))
+
+        # Sparse output in half precision
+        with self.assertRaises(ValueError):
+            desc = copy.deepcopy(default_desc_k2_k3)
+            desc.sparse = True
+            desc.dtype = "float16"
+
     def test_parallel_dense(self):
         """Tests creating dense output parallelly.
         """
@@ -2,11 +2,13 @@ import math
 import copy
 import numpy as np
 import unittest
+import unittest.mock
 
 import scipy.sparse
 from scipy.signal import find_peaks_cwt, find_peaks
 
 from dscribe.descriptors import MBTR
+import dscribe.descriptors.mbtr
 
 from ase.build import bulk
 from ase.build import molecule
@@ -471,6 +473,104 @@ class MBTRTests(TestBaseClass, unittest.TestCase):
         vec = desc.create(H2O)
         self.assertTrue(type(vec) == scipy.sparse.coo_matrix)
 
+    def test_dtype(self):
+        """Tests that the output is created with the requested data type.
+        """
+        reference = default_desc_k1_k2_k3.create(H2O)
+        for dtype in ["float16", "float32", "float64"]:
+            # Dense
+            desc = copy.deepcopy(default_desc_k1_k2_k3)
+            desc.dtype = dtype
+            vec = desc.create(H2O)
+            self.assertEqual(vec.dtype, np.dtype(dtype))
+            self.assertTrue(np.allclose(vec, reference, rtol=1e-2, atol=1e-2))
+
+            # Multiple systems
+            vec = desc.create([H2O, H2O], n_jobs=2)
+            self.assertEqual(vec.dtype, np.dtype(dtype))
+
+            # Sparse, not supported by scipy in half precision
+            if dtype != "float16":
+                desc.sparse = True
+                vec = desc.create(H2O)
+                self.assertEqual(vec.dtype, np.dtype(dtype))
+                vec = desc.create([H2O, H2O], n_jobs=2)
+                self.assertEqual(vec.dtype, np.dtype(dtype))
+                desc.sparse = False
+
+            # Non-flattened output
+            desc.flatten = False
+            tensors = desc.create(H2O)
+            for tensor in tensors.values():
+                self.assertEqual(tensor.dtype, np.dtype(dtype))
+
+        # Invalid data type
+        with self.assertRaises(ValueError):
+            desc = copy.deepcopy(default_desc_k1)
+            desc.dtype = "int32"
+
+        # Sparse output in half precision
+        with self.assertRaises(ValueError):
+            MBTR(
+                species=[1, 8],
+                k1=default_k1,
+                periodic=False,
+                sparse=True,
+                dtype="float16",
+            )
+        with self.assertRaises(ValueError):
+            desc = copy.deepcopy(default_desc_k1)
+            desc.dtype = "float16"
+            desc.sparse = True
+        with self.assertRaises(ValueError):
+            desc = copy.deepcopy(default_desc_k1)
+            desc.sparse = True
+            desc.dtype = "float16"
+
+    def test_threads(self):
+        """Tests that calculating the terms in threads gives the same output
+        as the serial calculation and that errors are propagated.
+        """
+        for flatten in [True, False]:
+            desc = copy.deepcopy(default_desc_k1_k2_k3)
+            desc.flatten = flatten
+            serial = desc.create_single(H2O, use_threads=False)
+
+            # The threads are only used on multi-core machines
+            with unittest.mock.patch("os.cpu_count", return_value=4), \
+                    unittest.mock.patch("dscribe.descriptors.mbtr._get_executor", wraps=dscribe.descriptors.mbtr._get_executor) as executor:
+                threaded = desc.create_single(H2O)
+                self.assertTrue(executor.called)
+            if flatten:
+                self.assertTrue(np.array_equal(threaded, serial))
+            else:
+                for key in serial.keys():
+                    self.assertTrue(np.array_equal(threaded[key], serial[key]))
+
+        # An error in one of the terms is raised in the calling thread
+        desc = copy.deepcopy(default_desc_k1_k2_k3)
+        with unittest.mock.patch("os.cpu_count", return_value=4), \
+                unittest.mock.patch.object(desc, "_get_k2", side_effect=RuntimeError("k2 failed")):
+            with self.assertRaises(RuntimeError):
+                desc.create_single(H2O)
+
+    def test_output_array(self):
+        """Tests that the flattened terms are written into a given output
+        array, also when the array is not contiguous.
+        """
+        desc = copy.deepcopy(default_desc_k1_k2_k3)
+        desc.create(H2O)
+        system = desc.get_system(H2O)
+        for func in [desc._get_k1, desc._get_k2, desc._get_k3]:
+            assumed = func(system)
+            buffer = np.zeros((1, 2*assumed.shape[1]), dtype=np.float32)
+            out = buffer[:, ::2]
+            self.assertFalse(out.flags.c_contiguous)
+            func(system, out=out)
+            self.assertTrue(np.array_equal(out, assumed))
+            self.assertTrue(np.any(out != 0))
+            self.assertTrue(np.all(buffer[:, 1::2] == 0))
+
     def test_properties(self):
         """Used to test that changing the setup through properties works as
         intended.